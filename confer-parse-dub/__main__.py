@@ -1,112 +1,348 @@
 import argparse
+import collections
+import concurrent.futures
+import contextlib
+import difflib
+import functools
+import glob
+import hashlib
+import heapq
+import io
 import json
-import operator
+import os
+import pickle
 import pprint
 import pyperclip
 import re
+import sqlite3
 import string
 import sys
+import tempfile
+import time
 import titlecase
-import xmltodict
+import traceback
+import unicodedata
+import xml.etree.ElementTree as ElementTree
 import yaml
 
+try:
+    import msgpack
+except ImportError:
+    msgpack = None
 
-def parse_config(config):
-    assert(isinstance(config['file_input'], str))
-    assert(isinstance(config['file_input_type'], str))
-    assert(config['file_input_type'] in ['sigchi program'])
-    assert(isinstance(config['file_output'], str))
 
+# Bump when a change to parsing or compiling would change cached results
+PARSER_VERSION = 4
 
-def parse_sigchi_program(config):
-    # Parse the json.
-    #
-    # Requires the file start with an opening bracket.
-    with open(config['file_input'], 'r', encoding='utf-8') as f:
-        parsed_json = json.load(f)
+# Permissions for files we write, as open() would create them
+FILE_UMASK = os.umask(0)
+os.umask(FILE_UMASK)
+FILE_MODE = 0o666 & ~FILE_UMASK
 
-    # Populate these items
-    items = parsed_json['contents']
+# Use LibYAML when it is available, it produces the same output much faster
+YamlSafeLoader = getattr(yaml, 'CSafeLoader', yaml.SafeLoader)
+YamlSafeDumper = getattr(yaml, 'CSafeDumper', yaml.SafeDumper)
 
-    # Simplify for our needs
-    for content_current in items:
-        if 'abstract' in content_current:
-            del content_current['abstract']
-        if 'keywords' in content_current:
-            del content_current['keywords']
-        if 'tags' in content_current:
-            del content_current['tags']
+# Stage timings and counters, only collected while profiling
+profile_report = None
 
-        if 'award' in content_current:
-            if content_current['award'] == 'BEST_PAPER':
-                content_current['bestpaper'] = True
-            else:
-                content_current['bestpaper'] = False
 
-            if content_current['award'] == 'HONORABLE_MENTION':
-                content_current['honorablemention'] = True
-            else:
-                content_current['honorablemention'] = False
+def start_profile():
+    global profile_report
+    profile_report = {
+        'stages': [],
+        'counters': {},
+    }
 
-            del content_current['award']
-        else:
-            content_current['bestpaper'] = False
-            content_current['honorablemention'] = False
 
-        if 'doi' in content_current:
-            match = re.search('https://doi.org/(.+)', content_current['doi'])
-            if match:
-                content_current['doi'] = 'https://dl.acm.org/doi/abs/' + match.group(1)
+@contextlib.contextmanager
+def profile_stage(name):
+    # Yields a dict for the stage, where the caller can record how many items it handled
+    stage = {
+        'stage': name,
+    }
+    if profile_report is None:
+        yield stage
+        return
 
-        if 'videos' in content_current:
-            for video_current in content_current['videos']:
-                if video_current['type'] == 'Video preview':
-                    content_current['videopreview'] = video_current['url']
+    time_start = time.perf_counter()
+    try:
+        yield stage
+    finally:
+        stage['seconds'] = time.perf_counter() - time_start
+        profile_report['stages'].append(stage)
 
-            del content_current['videos']
 
-    # Go through content to see which match our criteria
-    filtered_items = []
-    for content_current in items:
-        if match_include(config, parsed_json, content_current):
-            filtered_items.append(content_current)
-    items = filtered_items
+def profile_count(counter, count=1):
+    if profile_report is not None:
+        profile_report['counters'][counter] = profile_report['counters'].get(counter, 0) + count
 
-    # Go through to remove any excludes
-    filtered_items = []
-    for content_current in items:
-        if not match_exclude(config, parsed_json, content_current):
-            filtered_items.append(content_current)
-    items = filtered_items
 
-    # Expand names from personId
-    for content_current in items:
-        for author_current in content_current['authors']:
-            author_match = next(author_test for author_test in parsed_json['people'] if author_test['id'] == author_current['personId'])
+class Affiliation:
+    """An affiliation of an author as it appears in the program."""
 
-            author_names = []
-            if 'firstName' in author_match:
-                author_names.append(author_match['firstName'])
-            if 'middleInitial' in author_match:
-                author_names.extend(author_match['middleInitial'].strip('.').split('.'))
-            if 'lastName' in author_match:
-                author_names.append(author_match['lastName'])
+    __slots__ = ('institution', 'dsl')
 
-            author_current['name'] = ' '.join(author_names)
-            del author_current['personId']
+    def __init__(self, institution, dsl):
+        # The same institutions appear across many authors, so share one copy of each
+        self.institution = sys.intern(institution)
+        self.dsl = sys.intern(dsl)
 
-    # Normalize names
-    items = normalize_names(config, items)
+    def to_dict(self):
+        return {
+            'institution': self.institution,
+            'dsl': self.dsl,
+        }
 
-    # Normalize affiliations
-    items = normalize_affiliations(config, items)
 
-    # Normalize title
-    for content_current in items:
-        content_current['title'] = normalize_title(content_current['title'])
+class Author:
+    """An author with their program affiliations, until matched to a canonical affiliation."""
 
-    # Sort publications
-    items = sort_items(config, items)
+    __slots__ = ('name', 'affiliations', 'affiliation')
+
+    def __init__(self, name, affiliations):
+        self.name = sys.intern(name)
+        self.affiliations = affiliations
+        self.affiliation = None
+
+    def to_dict(self):
+        if self.affiliation is None:
+            return {
+                'affiliations': [affiliation_current.to_dict() for affiliation_current in self.affiliations],
+                'name': self.name,
+            }
+
+        return {
+            'affiliation': self.affiliation,
+            'name': self.name,
+        }
+
+
+class Paper:
+    """A paper, with any other fields of the program kept as they are for output."""
+
+    __slots__ = ('id', 'title', 'authors', 'bestpaper', 'honorablemention', 'fields')
+
+    def __init__(self, id, title, authors, bestpaper=False, honorablemention=False, fields=None):
+        self.id = id
+        self.title = title
+        self.authors = authors
+        self.bestpaper = bestpaper
+        self.honorablemention = honorablemention
+        self.fields = fields or {}
+
+    def to_dict(self):
+        paper = dict(self.fields)
+        paper.update({
+            'id': self.id,
+            'title': self.title,
+            'authors': [author_current.to_dict() for author_current in self.authors],
+            'bestpaper': self.bestpaper,
+            'honorablemention': self.honorablemention,
+        })
+
+        return paper
+
+
+# Fields of program content kept on a Paper, any others are kept in its fields
+PAPER_FIELDS = {'id', 'title', 'authors', 'bestpaper', 'honorablemention'}
+
+
+def parse_config(config):
+    assert(isinstance(config['file_input'], str))
+    assert(isinstance(config['file_input_type'], str))
+    assert(config['file_input_type'] in INPUT_TYPES)
+    assert(isinstance(config['file_output'], str))
+    assert(isinstance(config.get('file_output_json', ''), str))
+    assert(isinstance(config.get('file_output_msgpack', ''), str))
+    assert('file_output_msgpack' not in config or msgpack is not None), 'file_output_msgpack requires the msgpack package'
+
+
+def load_config(file_config):
+    return prepare_config(read_config(file_config))
+
+
+def read_config(file_config):
+    with open(file_config, 'r', encoding='utf-8') as f:
+        return yaml.load(f, Loader=YamlSafeLoader)
+
+
+def prepare_config(config):
+    # Inherit names and affiliations from a shared registry, with this config's entries taking precedence
+    if 'registry' in config:
+        registry = load_registry(config['registry'])
+        config['registry_key'] = registry['key']
+
+        names = config.get('names', None) or []
+        affiliations = config.get('affiliations', None) or []
+        config['names'] = merge_rules(registry['names'], names, 'name')
+        config['affiliations'] = merge_rules(registry['affiliations'], affiliations, 'canonical')
+
+        # Compile only this config's entries, over the compiled registry
+        cache_key = json.dumps(config['names'], sort_keys=True)
+        if cache_key not in compiled_names_cache:
+            compiled_names_cache[cache_key] = overlay_names(registry, names)
+        cache_key = json.dumps(config['affiliations'], sort_keys=True)
+        if cache_key not in compiled_affiliations_cache:
+            compiled_affiliations_cache[cache_key] = overlay_affiliations(registry, affiliations)
+
+    parse_config(config)
+
+    return config
+
+
+# Registries loaded in this process, by the hash of their source
+loaded_registries = {}
+
+
+def load_registry(file_registry):
+    with open(file_registry, 'rb') as f:
+        source = f.read()
+
+    registry_key = hashlib.sha256(str(PARSER_VERSION).encode('utf-8') + source).hexdigest()
+    if registry_key in loaded_registries:
+        return loaded_registries[registry_key]
+
+    # Prefer the compiled registry, which is invalid once the source changes
+    file_compiled = file_registry + '.compiled.pickle'
+    try:
+        with open(file_compiled, 'rb') as f:
+            registry = pickle.load(f)
+    except (OSError, pickle.UnpicklingError, EOFError, AttributeError, ImportError):
+        registry = None
+
+    if not isinstance(registry, dict) or registry.get('key') != registry_key:
+        rules = yaml.load(source.decode('utf-8'), Loader=YamlSafeLoader) or {}
+        registry = {
+            'key': registry_key,
+            'names': rules.get('names', None) or [],
+            'affiliations': rules.get('affiliations', None) or [],
+        }
+        registry['compiled_names'] = {
+            'index': {},
+            'ambiguous': {},
+        }
+        index_names(registry['compiled_names'], registry['names'])
+        registry['compiled_affiliations'] = new_compiled_affiliations(registry['affiliations'])
+        index_affiliations(registry['compiled_affiliations'], registry['affiliations'])
+
+        # Where to find the entries a config can override
+        registry['names_by_name'] = {}
+        for standard_name_current in registry['names']:
+            registry['names_by_name'].setdefault(standard_name_current['name'], []).append(standard_name_current)
+        registry['positions_by_canonical'] = {}
+        for position_current, normalized_affiliation_current in enumerate(registry['affiliations']):
+            registry['positions_by_canonical'].setdefault(normalized_affiliation_current['canonical'], []).append(position_current)
+
+        # The compiled registry is only a cache, so we can still continue without it
+        try:
+            write_atomic(file_compiled, lambda f: pickle.dump(registry, f, protocol=pickle.HIGHEST_PROTOCOL))
+        except OSError as e:
+            print('Unable to write compiled registry: {}'.format(e))
+
+    loaded_registries[registry_key] = registry
+
+    return registry
+
+
+def merge_rules(registry_rules, config_rules, field):
+    # A config entry replaces every registry entry with the same name or canonical
+    overridden = set(rule_current[field] for rule_current in config_rules)
+
+    return [
+        rule_current
+        for rule_current in registry_rules
+        if rule_current[field] not in overridden
+    ] + config_rules
+
+
+def overlay_names(registry, names):
+    # Share the registry index, copying only the ambiguous names, which are few
+    compiled_names = {
+        'index': dict(registry['compiled_names']['index']),
+        'ambiguous': {
+            name_current: list(matches_found)
+            for name_current, matches_found in registry['compiled_names']['ambiguous'].items()
+        },
+    }
+    index = compiled_names['index']
+    ambiguous = compiled_names['ambiguous']
+
+    # Remove registry entries this config overrides, as if they had never been indexed
+    for name_overridden in set(standard_name_current['name'] for standard_name_current in names):
+        for standard_name_removed in registry['names_by_name'].get(name_overridden, []):
+            match_names = [standard_name_removed['name']]
+            if 'match' in standard_name_removed:
+                match_names.extend([match_current['name'] for match_current in standard_name_removed['match']])
+
+            for match_name_current in match_names:
+                if match_name_current in ambiguous:
+                    matches_remaining = [
+                        match_current
+                        for match_current in ambiguous[match_name_current]
+                        if match_current is not standard_name_removed
+                    ]
+                    index[match_name_current] = matches_remaining[0]
+                    if len(matches_remaining) > 1:
+                        ambiguous[match_name_current] = matches_remaining
+                    else:
+                        del ambiguous[match_name_current]
+                elif index.get(match_name_current) is standard_name_removed:
+                    del index[match_name_current]
+
+    # Then index this config's entries after the registry's
+    index_names(compiled_names, names)
+
+    return compiled_names
+
+
+def overlay_affiliations(registry, affiliations):
+    # Share the registry index, hiding the positions of affiliations this config overrides
+    compiled_registry = registry['compiled_affiliations']
+    compiled_affiliations = {
+        'affiliations': compiled_registry['affiliations'] + affiliations,
+        'by_name': dict(compiled_registry['by_name']),
+        'by_affiliation': dict(compiled_registry['by_affiliation']),
+        'by_institution': dict(compiled_registry['by_institution']),
+        'unindexed': list(compiled_registry['unindexed']),
+        'hidden': set(compiled_registry['hidden']),
+    }
+    for normalized_affiliation_current in affiliations:
+        compiled_affiliations['hidden'].update(registry['positions_by_canonical'].get(normalized_affiliation_current['canonical'], []))
+
+    # Then index this config's entries after the registry's
+    index_affiliations(compiled_affiliations, affiliations, position_start=len(compiled_registry['affiliations']))
+
+    return compiled_affiliations
+
+
+def parse_program(config, stream=False, cache=False, incremental=False, diagnostics=None):
+    if cache or incremental:
+        cache_key = program_cache_key(config)
+
+    items = load_program(config, stream=stream, cache_key=cache_key if cache else None)
+
+    if incremental:
+        # Reuse results from a previous run on the same program
+        incremental_state = read_incremental_state(config, cache_key)
+        author_keys = [
+            [incremental_author_key(author_current) for author_current in content_current.authors]
+            for content_current in items
+        ]
+        item_positions = {id(content_current): position_current for position_current, content_current in enumerate(items)}
+    else:
+        incremental_state = None
+
+    if incremental_state:
+        with profile_stage('normalize incremental') as stage:
+            items = normalize_incremental(config, items, author_keys, incremental_state, diagnostics=diagnostics)
+            stage['items'] = count_authors(items)
+    else:
+        items = normalize_program(config, items, diagnostics=diagnostics)
+
+    # Only results without problems can be reused
+    if incremental and (diagnostics is None or not has_problems(diagnostics)):
+        write_incremental_state(config, cache_key, items, author_keys, item_positions)
 
     # print(json.dumps(items, indent=2))
 
@@ -175,226 +411,1048 @@ def parse_sigchi_program(config):
     return items
 
 
-def match_exclude(config, parsed_json, content_current):
-    for exclude_current in config['exclude']:
-        match_current = True
+def load_program(config, stream=False, cache_key=None):
+    if cache_key is not None:
+        # Reuse the reduced program from a previous run on the same input and criteria
+        cached_program = read_program_cache(config, cache_key)
+    else:
+        cached_program = None
 
-        if match_current and 'id' in exclude_current:
-            match_current &= 'id' in content_current and exclude_current['id'] == content_current['id']
+    if cached_program:
+        items = cached_program['items']
+        profile_count('program cache hits')
+    else:
+        # Load the papers matching our criteria, each author with a name and affiliations
+        items = INPUT_TYPES[config['file_input_type']](config, stream=stream)
 
-        if match_current:
-            return True
+        if cache_key is not None:
+            write_program_cache(config, cache_key, items)
 
-    return False
+    return items
 
-    # # Go through to apply our excludes
-    # #
-    # # This 'works enough' but is probably not robust or formally defined
-    # filtered_items = []
-    # for item_current in items:
-    #     match_exclude = False
-    #
-    #     if config['exclude']:
-    #         for exclude_current in config['exclude']:
-    #             if 'id' in exclude_current:
-    #                 match_exclude |= exclude_current['id'] == item_current['id']
-    #
-    #     if not match_exclude:
-    #         filtered_items.append(item_current)
-    #
-    # return filtered_items
 
+def normalize_program(config, items, diagnostics=None):
+    # Normalize names
+    with profile_stage('normalize names') as stage:
+        items = normalize_names(config, items, diagnostics=diagnostics)
+        stage['items'] = count_authors(items)
 
-def match_include(config, parsed_json, content_current):
-    for include_current in config['include']:
-        match_current = True
+    # Normalize affiliations
+    with profile_stage('normalize affiliations') as stage:
+        items = normalize_affiliations(config, items, diagnostics=diagnostics)
+        stage['items'] = count_authors(items)
+
+    # Normalize title
+    with profile_stage('normalize titles') as stage:
+        items = normalize_titles(config, items)
+        stage['items'] = len(items)
+
+    # Sort publications
+    with profile_stage('sort') as stage:
+        items = sort_items(config, items)
+        stage['items'] = len(items)
+
+    return items
+
+
+def load_sigchi_program(config, stream=False):
+    items, people_index = reduce_sigchi_program(config, stream=stream)
+
+    # Build papers, expanding names from personId
+    with profile_stage('build papers') as stage:
+        items = build_papers(items, people_index)
+        stage['items'] = count_authors(items)
+
+    return items
+
+
+def load_proceedings_xml(config, stream=False):
+    # Proceedings are always read incrementally, one paper element at a time
+    compiled_filters = compile_filters(config)
+
+    items = []
+    with profile_stage('load and filter') as stage:
+        path = []
+        for event, element in ElementTree.iterparse(config['file_input'], events=('start', 'end')):
+            if event == 'start':
+                path.append(element)
+                continue
+
+            path.pop()
+
+            # Papers in the paper list, not references to papers in other lists
+            if element.tag == 'paper' and path and path[-1].tag == 'paper_list':
+                # There is no separate institution, so match on the complete affiliation
+                content_current = {
+                    'id': element.get('id'),
+                    'authors': [
+                        {
+                            'affiliations': [
+                                {
+                                    'institution': affiliation_element.text or '',
+                                    'dsl': '',
+                                }
+                                for affiliation_element in author_element.findall('affiliation')
+                            ],
+                        }
+                        for author_element in element.findall('author')
+                    ],
+                }
+
+                if filter_contents(compiled_filters, [content_current]):
+                    items.append(Paper(
+                        content_current['id'],
+                        element.findtext('title', default=''),
+                        [
+                            Author(
+                                author_element.findtext('name', default=''),
+                                [
+                                    Affiliation(affiliation_current['institution'], affiliation_current['dsl'])
+                                    for affiliation_current in author_current['affiliations']
+                                ],
+                            )
+                            for author_element, author_current in zip(element.findall('author'), content_current['authors'])
+                        ],
+                    ))
+
+            # Release each element once read, so memory follows the matched papers
+            if len(path) <= 2:
+                element.clear()
+                if path:
+                    path[-1].remove(element)
+
+        stage['items'] = len(items)
+
+    return items
+
+
+def person_name(person):
+    person_names = []
+    if 'firstName' in person:
+        person_names.append(person['firstName'])
+    if 'middleInitial' in person:
+        person_names.extend(person['middleInitial'].strip('.').split('.'))
+    if 'lastName' in person:
+        person_names.append(person['lastName'])
+
+    return ' '.join(person_names)
+
+
+def build_papers(items, people_index):
+    # Replace the program content with papers, leaving the program to be released
+    papers = []
+    for content_current in items:
+        papers.append(Paper(
+            content_current['id'],
+            content_current['title'],
+            [
+                Author(
+                    person_name(lookup_person(people_index, author_current['personId'])),
+                    [
+                        Affiliation(affiliation_current['institution'], affiliation_current.get('dsl', ''))
+                        for affiliation_current in author_current['affiliations']
+                    ],
+                )
+                for author_current in content_current['authors']
+            ],
+            bestpaper=content_current['bestpaper'],
+            honorablemention=content_current['honorablemention'],
+            fields={
+                key_current: value_current
+                for key_current, value_current in content_current.items()
+                if key_current not in PAPER_FIELDS
+            },
+        ))
+
+    return papers
+
+
+def simplify_contents(items):
+    for content_current in items:
+        if 'abstract' in content_current:
+            del content_current['abstract']
+        if 'keywords' in content_current:
+            del content_current['keywords']
+        if 'tags' in content_current:
+            del content_current['tags']
+
+        if 'award' in content_current:
+            if content_current['award'] == 'BEST_PAPER':
+                content_current['bestpaper'] = True
+            else:
+                content_current['bestpaper'] = False
+
+            if content_current['award'] == 'HONORABLE_MENTION':
+                content_current['honorablemention'] = True
+            else:
+                content_current['honorablemention'] = False
+
+            del content_current['award']
+        else:
+            content_current['bestpaper'] = False
+            content_current['honorablemention'] = False
+
+        if 'doi' in content_current:
+            match = re.search('https://doi.org/(.+)', content_current['doi'])
+            if match:
+                content_current['doi'] = 'https://dl.acm.org/doi/abs/' + match.group(1)
+
+        if 'videos' in content_current:
+            for video_current in content_current['videos']:
+                if video_current['type'] == 'Video preview':
+                    content_current['videopreview'] = video_current['url']
+
+            del content_current['videos']
+
+    return items
+
+
+def reduce_sigchi_program(config, stream=False):
+    # Compile our criteria once, so filtering can happen before any other work
+    compiled_filters = compile_filters(config)
+
+    if stream:
+        # Parse the json incrementally, keeping only content that matches our criteria
+        with profile_stage('load and filter') as stage:
+            parsed_json = stream_sigchi_program(config, compiled_filters)
+            stage['items'] = len(parsed_json['contents'])
+    else:
+        # Parse the json.
+        #
+        # Requires the file start with an opening bracket.
+        with profile_stage('load') as stage:
+            with open(config['file_input'], 'r', encoding='utf-8') as f:
+                parsed_json = json.load(f)
+            stage['items'] = len(parsed_json['contents'])
+
+        # Go through content to see which match our criteria
+        with profile_stage('filter') as stage:
+            parsed_json['contents'] = filter_contents(compiled_filters, parsed_json['contents'])
+            stage['items'] = len(parsed_json['contents'])
+
+    # Populate these items
+    items = parsed_json['contents']
 
-        if match_current and 'id' in include_current:
-            match_current &= 'id' in content_current and include_current['id'] == content_current['id']
+    # Simplify for our needs
+    with profile_stage('simplify') as stage:
+        items = simplify_contents(items)
+        stage['items'] = len(items)
+
+    # Index the people our content refers to, shared by all later people lookups
+    with profile_stage('index people') as stage:
+        people_index = index_people(parsed_json['people'])
+        people_index = {
+            author_current['personId']: lookup_person(people_index, author_current['personId'])
+            for content_current in items
+            for author_current in content_current['authors']
+        }
+        stage['items'] = len(people_index)
+
+    return items, people_index
+
+
+def write_atomic(file_path, write):
+    # Write to a temporary file of our own and then replace, so an interrupted write is never read
+    # and concurrent writers of the same file never share a temporary file
+    file_descriptor, file_temporary = tempfile.mkstemp(
+        dir=os.path.dirname(os.path.abspath(file_path)),
+        prefix=os.path.basename(file_path) + '.',
+        suffix='.tmp',
+    )
+    try:
+        with os.fdopen(file_descriptor, 'wb') as f:
+            write(f)
+        os.chmod(file_temporary, FILE_MODE)
+        os.replace(file_temporary, file_path)
+    except BaseException:
+        with contextlib.suppress(OSError):
+            os.remove(file_temporary)
+        raise
+
+
+def program_cache_key(config):
+    # Hash the input file, reading it in chunks
+    input_hash = hashlib.sha256()
+    with open(config['file_input'], 'rb') as f:
+        for chunk in iter(lambda: f.read(1 << 20), b''):
+            input_hash.update(chunk)
+
+    # The reduced program also depends on our parser and our criteria
+    cache_key = hashlib.sha256()
+    cache_key.update(str(PARSER_VERSION).encode('utf-8'))
+    cache_key.update(config['file_input_type'].encode('utf-8'))
+    cache_key.update(input_hash.digest())
+    cache_key.update(json.dumps([config['include'], config['exclude']], sort_keys=True).encode('utf-8'))
+
+    return cache_key.hexdigest()
+
+
+def program_cache_file(config):
+    if 'file_cache' in config:
+        return config['file_cache']
+
+    # Programs reduced with different criteria each have their own cache
+    criteria_hash = hashlib.sha256(json.dumps([config['include'], config['exclude']], sort_keys=True).encode('utf-8')).hexdigest()
+
+    return '{}.{}.cache.pickle'.format(config['file_input'], criteria_hash[:12])
+
+
+def read_program_cache(config, cache_key):
+    try:
+        with open(program_cache_file(config), 'rb') as f:
+            cached_program = pickle.load(f)
+    except (OSError, pickle.UnpicklingError, EOFError, AttributeError, ImportError):
+        return None
+
+    if not isinstance(cached_program, dict) or cached_program.get('key') != cache_key:
+        return None
+
+    return cached_program
+
+
+def write_program_cache(config, cache_key, items):
+    write_atomic(
+        program_cache_file(config),
+        lambda f: pickle.dump(
+            {
+                'key': cache_key,
+                'items': items,
+            },
+            f,
+            protocol=pickle.HIGHEST_PROTOCOL
+        )
+    )
+
+
+def incremental_state_file(config):
+    if 'file_state' in config:
+        return config['file_state']
+
+    return config['file_output'] + '.state.pickle'
+
+
+def incremental_author_key(author_current):
+    # Everything about a raw author that matching depends on
+    return (
+        normalize_text(author_current.name),
+        tuple(
+            (normalize_text(affiliation_current.institution), normalize_text(affiliation_current.dsl))
+            for affiliation_current in author_current.affiliations
+        ),
+    )
+
+
+def rules_fingerprints(rules, field):
+    # Group rules by their canonical field, so a changed rule can be found by comparison
+    fingerprints = {}
+    for rule_current in rules:
+        fingerprints.setdefault(rule_current[field], []).append(json.dumps(rule_current, sort_keys=True))
+
+    return fingerprints
+
+
+def changed_rules(fingerprints_old, fingerprints_new):
+    # Return both versions of every rule that was added, removed, or changed
+    rules_changed = []
+    for key_current in set(fingerprints_old) | set(fingerprints_new):
+        if fingerprints_old.get(key_current) != fingerprints_new.get(key_current):
+            for rule_current in fingerprints_old.get(key_current, []) + fingerprints_new.get(key_current, []):
+                rules_changed.append(json.loads(rule_current))
+
+    return rules_changed
+
+
+def name_rule_keys(standard_name_current):
+    # Keys of the author names a names rule can match
+    rule_keys = {('name', standard_name_current['name'])}
+    for match_current in standard_name_current.get('match', None) or []:
+        rule_keys.add(('name', match_current['name']))
+
+    return rule_keys
+
+
+def affiliation_rule_keys(normalized_affiliation_current):
+    # Keys of the authors an affiliations rule can match or reject
+    rule_keys = set()
+    if 'match' in normalized_affiliation_current:
+        for match_pattern_current in normalized_affiliation_current['match']:
+            if 'name' in match_pattern_current:
+                rule_keys.add(('person', match_pattern_current['name']))
+            elif match_pattern_current.get('affiliations'):
+                for affiliation_pattern_current in match_pattern_current['affiliations']:
+                    rule_keys.add((
+                        'affiliation',
+                        affiliation_pattern_current.get('institution'),
+                        affiliation_pattern_current.get('dsl'),
+                    ))
+            else:
+                rule_keys.add(('any',))
+    else:
+        rule_keys.add(('institution', normalized_affiliation_current['canonical']))
+
+    for reject_pattern_current in normalized_affiliation_current.get('reject', None) or []:
+        if 'name' in reject_pattern_current:
+            rule_keys.add(('person', reject_pattern_current['name']))
+
+    return rule_keys
+
+
+def author_rule_keys(author_key, author_result):
+    # Keys of every rule that could have contributed to an author's result,
+    # mirroring the lookups of compile_names and match_affiliations
+    name, affiliations = author_key
+
+    rule_keys = {('name', name), ('person', author_result[0]), ('any',)}
+    if affiliations:
+        institution, dsl = affiliations[0]
+        rule_keys.update([
+            ('affiliation', institution, dsl),
+            ('affiliation', institution, None),
+            ('affiliation', None, dsl),
+            ('affiliation', None, None),
+        ])
+    if len(affiliations) == 1:
+        rule_keys.add(('institution', affiliations[0][0]))
 
-        if match_current and 'affiliation' in include_current:
-            match_affiliation = False
-            for author_current in content_current['authors']:
-                for affiliation_current in author_current['affiliations']:
-                    if include_current['affiliation'].casefold() in affiliation_current['institution'].casefold():
-                        match_affiliation = True
-            match_current &= match_affiliation
+    return rule_keys
 
-        # For debugging, print content that matches affiliation
-        # if match_affiliation:
-        #     print('Content matched affiliation:')
-        #     print(json.dumps(content_current, indent=2))
 
-        if match_current and 'trackId' in include_current:
-            match_current &= 'trackId' in content_current and include_current['trackId'] == content_current['trackId']
+def read_incremental_state(config, cache_key):
+    try:
+        with open(incremental_state_file(config), 'rb') as f:
+            incremental_state = pickle.load(f)
+    except (OSError, pickle.UnpicklingError, EOFError, AttributeError, ImportError):
+        return None
 
-        # if match_current and 'typeId' in include_current:
-        #     match_current &= 'typeId' in content_current and include_current['typeId'] == content_current['typeId']
+    # Results can only be reused for the same reduced program
+    if not isinstance(incremental_state, dict) or incremental_state.get('key') != cache_key:
+        return None
+
+    return incremental_state
+
+
+def write_incremental_state(config, cache_key, items, author_keys, item_positions):
+    author_results = {}
+    for content_current in items:
+        for author_key, author_current in zip(author_keys[item_positions[id(content_current)]], content_current.authors):
+            author_results[author_key] = (author_current.name, author_current.affiliation)
+
+    write_atomic(
+        incremental_state_file(config),
+        lambda f: pickle.dump(
+            {
+                'key': cache_key,
+                'names': rules_fingerprints(config['names'], 'name'),
+                'affiliations': rules_fingerprints(config['affiliations'], 'canonical'),
+                'title_fixups': compile_title_fixups(config),
+                'authors': author_results,
+                'titles': [content_current.title for content_current in items],
+                'order': [item_positions[id(content_current)] for content_current in items],
+            },
+            f,
+            protocol=pickle.HIGHEST_PROTOCOL
+        )
+    )
+
+
+def normalize_incremental(config, items, author_keys, incremental_state, diagnostics=None):
+    # Find the keys of every rule that changed since the previous run
+    changed_keys = set()
+    for standard_name_current in changed_rules(incremental_state['names'], rules_fingerprints(config['names'], 'name')):
+        changed_keys |= name_rule_keys(standard_name_current)
+    for normalized_affiliation_current in changed_rules(incremental_state['affiliations'], rules_fingerprints(config['affiliations'], 'canonical')):
+        changed_keys |= affiliation_rule_keys(normalized_affiliation_current)
+
+    # Reuse results for authors no changed rule could affect, collect the rest
+    affected_authors = []
+    for content_current, content_author_keys in zip(items, author_keys):
+        for author_key, author_current in zip(content_author_keys, content_current.authors):
+            author_result = incremental_state['authors'].get(author_key)
+            if author_result is None or author_rule_keys(author_key, author_result) & changed_keys:
+                affected_authors.append(author_current)
+            else:
+                author_current.name = author_result[0]
+                author_current.affiliation = author_result[1]
+                author_current.affiliations = None
+
+    # Match only the affected authors
+    profile_count('incremental affected authors', len(affected_authors))
+    normalize_names(config, [Paper(None, '', affected_authors)], diagnostics=diagnostics)
+    normalize_affiliations(config, [Paper(None, '', affected_authors)], diagnostics=diagnostics)
+
+    # Titles and order depend only on the program and title fixups, so reuse them if those are unchanged
+    if incremental_state.get('title_fixups') == compile_title_fixups(config):
+        items = [items[position_current] for position_current in incremental_state['order']]
+        for content_current, title_current in zip(items, incremental_state['titles']):
+            content_current.title = title_current
+    else:
+        items = normalize_titles(config, items)
+        items = sort_items(config, items)
+
+    return items
+
+
+class JsonStreamReader:
+    """Incrementally read json values from a text file, one chunk at a time."""
+
+    def __init__(self, f, decoder, chunk_size=1 << 16):
+        self.f = f
+        self.decoder = decoder
+        self.chunk_size = chunk_size
+        self.buffer = ''
+        self.position = 0
+        self.eof = False
+
+    def read(self, size):
+        # Drop what has already been consumed, then append the next chunk
+        chunk = self.f.read(size)
+        if not chunk:
+            self.eof = True
+        self.buffer = self.buffer[self.position:] + chunk
+        self.position = 0
+
+    def peek(self):
+        # Skip whitespace and return the next character, or '' at the end of the file
+        while True:
+            while self.position < len(self.buffer) and self.buffer[self.position] in ' \t\n\r':
+                self.position += 1
+            if self.position < len(self.buffer) or self.eof:
+                return self.buffer[self.position:self.position + 1]
+            self.read(self.chunk_size)
+
+    def expect(self, character):
+        if self.peek() != character:
+            raise ValueError('Expected "{}" at "{}"'.format(character, self.buffer[self.position:self.position + 40]))
+        self.position += 1
+
+    def decode(self):
+        self.peek()
+        size = self.chunk_size
+        while True:
+            try:
+                value, end = self.decoder.raw_decode(self.buffer, self.position)
+
+                # A value not followed by a delimiter may continue in the next chunk (e.g., a number)
+                if self.eof or (end < len(self.buffer) and self.buffer[end] in ',:]} \t\n\r'):
+                    self.position = end
+                    return value
+            except json.JSONDecodeError:
+                if self.eof:
+                    raise
+
+            # Read more, growing the read to keep large values from being decoded many times
+            self.read(size)
+            size *= 2
+
+    def iter_array(self):
+        self.expect('[')
+        if self.peek() == ']':
+            self.position += 1
+            return
+
+        while True:
+            yield self.decode()
+
+            if self.peek() == ',':
+                self.position += 1
+            else:
+                self.expect(']')
+                return
+
+    def iter_object_keys(self):
+        # Yields each key, the caller must consume its value before continuing
+        self.expect('{')
+        if self.peek() == '}':
+            self.position += 1
+            return
+
+        while True:
+            key = self.decode()
+            self.expect(':')
+
+            yield key
+
+            if self.peek() == ',':
+                self.position += 1
+            else:
+                self.expect('}')
+                return
+
+    def skip(self):
+        # Skip a value, without holding all of a large array in memory
+        if self.peek() == '[':
+            for value_current in self.iter_array():
+                pass
+        else:
+            self.decode()
+
+
+def stream_sigchi_program(config, compiled_filters):
+    # Abstracts are dropped as each object is decoded, never stored
+    decoder = json.JSONDecoder(
+        object_pairs_hook=lambda pairs: {key: value for key, value in pairs if key != 'abstract'}
+    )
+
+    parsed_json = {
+        'contents': [],
+        'people': [],
+    }
+
+    with open(config['file_input'], 'r', encoding='utf-8') as f:
+        reader = JsonStreamReader(f, decoder)
+
+        for key_current in reader.iter_object_keys():
+            if key_current == 'contents':
+                # Keep only content that matches our criteria
+                parsed_json['contents'] = filter_contents(compiled_filters, reader.iter_array())
+            elif key_current == 'people':
+                # Keep only the fields used to expand names
+                for person_current in reader.iter_array():
+                    parsed_json['people'].append({
+                        key: person_current[key]
+                        for key in ['id', 'firstName', 'middleInitial', 'lastName']
+                        if key in person_current
+                    })
+            else:
+                reader.skip()
+
+    return parsed_json
+
+
+def index_people(people):
+    people_index = {}
+    for person_current in people:
+        people_index[person_current['id']] = person_current
+
+    return people_index
+
+
+def lookup_person(people_index, person_id):
+    if person_id not in people_index:
+        raise KeyError('personId {} not found in program people'.format(person_id))
+
+    return people_index[person_id]
+
+
+def compile_filters(config):
+    # Precompute what include and exclude rules need, indexed by the field each rule requires
+    compiled_filters = {
+        'include_ids': set(),
+        'include_by_id': {},
+        'include_by_track': {},
+        'include_any': [],
+        'exclude_ids': set(),
+        'exclude_all': False,
+    }
+
+    for include_current in config['include'] or []:
+        rule_current = {}
+        if 'id' in include_current:
+            rule_current['id'] = include_current['id']
+        if 'affiliation' in include_current:
+            rule_current['affiliation'] = include_current['affiliation'].casefold()
+        if 'trackId' in include_current:
+            rule_current['trackId'] = include_current['trackId']
+
+        if rule_current.keys() == {'id'}:
+            # Include by id alone
+            compiled_filters['include_ids'].add(rule_current['id'])
+        elif 'id' in rule_current:
+            compiled_filters['include_by_id'].setdefault(rule_current['id'], []).append(rule_current)
+        elif 'trackId' in rule_current:
+            compiled_filters['include_by_track'].setdefault(rule_current['trackId'], []).append(rule_current)
+        else:
+            compiled_filters['include_any'].append(rule_current)
+
+    for exclude_current in config['exclude'] or []:
+        if 'id' in exclude_current:
+            compiled_filters['exclude_ids'].add(exclude_current['id'])
+        else:
+            # An exclude without criteria matches everything
+            compiled_filters['exclude_all'] = True
+
+    return compiled_filters
+
+
+def filter_contents(compiled_filters, contents):
+    filtered_items = []
+    for content_current in contents:
+        if match_include(compiled_filters, content_current) and not match_exclude(compiled_filters, content_current):
+            filtered_items.append(content_current)
+
+    return filtered_items
+
+
+def match_exclude(compiled_filters, content_current):
+    if compiled_filters['exclude_all']:
+        return True
+
+    return content_current.get('id') in compiled_filters['exclude_ids']
+
+
+def match_include(compiled_filters, content_current):
+    profile_count('include checks')
+    if content_current.get('id') in compiled_filters['include_ids']:
+        return True
+
+    # Only check rules that could match this content
+    rules_current = []
+    if 'id' in content_current:
+        rules_current.extend(compiled_filters['include_by_id'].get(content_current['id'], []))
+    if 'trackId' in content_current:
+        rules_current.extend(compiled_filters['include_by_track'].get(content_current['trackId'], []))
+    rules_current.extend(compiled_filters['include_any'])
+
+    profile_count('include rule evaluations', len(rules_current))
+
+    institutions = None
+    for rule_current in rules_current:
+        match_current = True
+
+        if match_current and 'trackId' in rule_current:
+            match_current &= 'trackId' in content_current and rule_current['trackId'] == content_current['trackId']
+
+        if match_current and 'affiliation' in rule_current:
+            # Casefold institutions once per content
+            if institutions is None:
+                institutions = [
+                    affiliation_current['institution'].casefold()
+                    for author_current in content_current['authors']
+                    for affiliation_current in author_current['affiliations']
+                ]
+            match_current &= any(rule_current['affiliation'] in institution_current for institution_current in institutions)
 
         if match_current:
             return True
 
-        # For debugging, print content that matches affiliation but was then rejected
-        # if match_affiliation:
-        #     print('Content matched affiliation but was then rejected:')
-        #     print(json.dumps(content_current, indent=2))
-
     return False
 
 
-def normalize_names(config, items):
+# Compiled names sections, shared across papers and conferences in one process
+compiled_names_cache = {}
+
+
+def compile_names(names):
+    # Reuse the compilation of an identical names section
+    cache_key = json.dumps(names, sort_keys=True)
+    if cache_key in compiled_names_cache:
+        return compiled_names_cache[cache_key]
+
+    compiled_names = {
+        'index': {},
+        'ambiguous': {},
+    }
+    index_names(compiled_names, names)
+    compiled_names_cache[cache_key] = compiled_names
+
+    return compiled_names
+
+
+def index_names(compiled_names, names):
+    # Index each standard name and each of its alternatives to the standard entry
+    index = compiled_names['index']
+    ambiguous = compiled_names['ambiguous']
+    for standard_name_current in names:
+        match_names = [standard_name_current['name']]
+        if 'match' in standard_name_current:
+            match_names.extend([match_current['name'] for match_current in standard_name_current['match']])
+
+        for match_name_current in match_names:
+            if match_name_current not in index:
+                index[match_name_current] = standard_name_current
+            elif index[match_name_current] is not standard_name_current:
+                # The same name leads to different standard entries
+                if match_name_current not in ambiguous:
+                    ambiguous[match_name_current] = [index[match_name_current]]
+                # Compare entries by identity, so identical entries are each listed
+                if not any(match_current is standard_name_current for match_current in ambiguous[match_name_current]):
+                    ambiguous[match_name_current].append(standard_name_current)
+
+
+def normalize_names(config, items, diagnostics=None):
     unmatched_authors = []
 
+    compiled_names = compile_names(config['names'])
+
+    # Ambiguous names are found when compiling, before matching any author
+    if compiled_names['ambiguous']:
+        if diagnostics is not None:
+            for name_current, matches_found in compiled_names['ambiguous'].items():
+                diagnostics['names']['ambiguous'].append({
+                    'name': name_current,
+                    'matches': [match_current['name'] for match_current in matches_found],
+                })
+        else:
+            for name_current, matches_found in compiled_names['ambiguous'].items():
+                print('Multiple Author Match:')
+                print(name_current)
+                print(matches_found)
+
+            assert False
+
     # Clean up author names
     for item_current in items:
-        for author_current in item_current['authors']:
+        for author_current in item_current.authors:
             # Clean it up
-            author_current['name'] = normalize_text(author_current['name'])
+            author_current.name = normalize_text(author_current.name)
+
+            # Ambiguous names are only reported, never matched
+            if author_current.name in compiled_names['ambiguous']:
+                continue
 
             # Check our approved authors, try to match one for this author
-            matches_found = []
-
-            for standard_name_current in config['names']:
-                # Exact match
-                if author_current['name'] == standard_name_current['name']:
-                    matches_found.append(standard_name_current)
-                # Exact match to any in our list of alternatives
-                elif 'match' in standard_name_current:
-                    for match_current in standard_name_current['match']:
-                        if author_current['name'] == match_current['name']:
-                            matches_found.append(standard_name_current)
+            profile_count('name lookups')
+            standard_name_current = compiled_names['index'].get(author_current.name)
 
-            if len(matches_found) == 1:
+            if standard_name_current is not None:
                 # For debugging, print name matches
                 # print(
                 #     'Name Match:  "{}" matched to known name "{}"'.format(
-                #         author_current['name'],
-                #         matches_found[0]['name']
+                #         author_current.name,
+                #         standard_name_current['name']
                 #     )
                 # )
 
-                author_current['name'] = matches_found[0]['name']
-            elif len(matches_found) == 0:
-                print('No Author Match:')
-                print(author_current)
-
-                unmatched_authors.append(author_current)
+                author_current.name = standard_name_current['name']
             else:
-                print('Multiple Author Match:')
-                print(author_current)
-                print(matches_found)
+                if diagnostics is None:
+                    print('No Author Match:')
+                    print(author_current.to_dict())
+                    print_suggestions(suggest_names(compiled_names, author_current))
 
-                assert False
+                unmatched_authors.append(author_current)
 
     if unmatched_authors:
         unmatched_authors = sorted(
             unmatched_authors,
-            key=lambda author_sort: author_sort["name"],
+            key=lambda author_sort: author_sort.name,
         )
 
-        pyperclip.copy(
-            '\n'.join(
-                [
-                    "  - name: '{}'".format(author_current['name'])
-                    for author_current in unmatched_authors
-                ]
-            )
-        )
+        # Each name needs adding only once, even for an author with several affiliations
+        unmatched_authors = unique_authors(unmatched_authors, key=lambda author_unique: author_unique.name)
+
+        if diagnostics is not None:
+            diagnostics['names']['unmatched'].extend([
+                {
+                    'name': author_current.name,
+                    'suggestions': suggest_names(compiled_names, author_current),
+                }
+                for author_current in unmatched_authors
+            ])
+            diagnostics['names']['stub'] = names_stub(unmatched_authors)
+        else:
+            pyperclip.copy(names_stub(unmatched_authors))
 
-    assert len(unmatched_authors) == 0
+    if diagnostics is None:
+        assert len(unmatched_authors) == 0
 
     return items
 
 
-def normalize_affiliations(config, items):
-    unmatched_authors = []
+def names_stub(unmatched_authors):
+    # Suggested YAML for the names section
+    return '\n'.join(
+        [
+            "  - name: '{}'".format(author_current.name)
+            for author_current in unmatched_authors
+        ]
+    )
 
-    for item_current in items:
-        for author_current in item_current['authors']:
-            # Check for a canonical affiliation for this author
-            matches_found = []
 
-            # Normalize strings before normalizing structure
-            for affiliation_author_current in author_current['affiliations']:
-                affiliation_author_current['institution'] = normalize_text(affiliation_author_current['institution'])
-                affiliation_author_current['dsl'] = normalize_text(affiliation_author_current['dsl'])
-
-            for normalized_affiliation_current in config['affiliations']:
-                # # Single-affiliation exact match (can't happen anymore, multiple fields in the json)
-                # if [normalized_affiliation_current['canonical']] == author_current['affiliations']:
-                #     matches_found.append(normalized_affiliation_current)
-
-                # If a match field exists, match to any pattern found in the list
-                if 'match' in normalized_affiliation_current:
-                    for match_pattern_current in normalized_affiliation_current['match']:
-                        # Within a particular pattern, match everything that is specified
-                        match_current = True
-
-                        # Match to a specific person
-                        if 'name' in match_pattern_current:
-                            match_current &= match_pattern_current['name'] == author_current['name']
-
-                        # Match to an affiliation list, requires matching all affiliations in both lists
-                        if 'affiliations' in match_pattern_current:
-                            matched_affiliations = []
-
-                            for affiliation_author_current in author_current['affiliations']:
-                                for affiliation_pattern_current in match_pattern_current['affiliations']:
-                                    # Require a match on everything
-                                    affiliation_match_current = True
-
-                                    if 'institution' in affiliation_pattern_current:
-                                        affiliation_match_current &= affiliation_pattern_current['institution'] == affiliation_author_current['institution']
-                                    if 'dsl' in affiliation_pattern_current:
-                                        affiliation_match_current &= affiliation_pattern_current['dsl'] == affiliation_author_current['dsl']
-
-                                    # If we match this pattern, track that and stop further matching of it
-                                    if affiliation_match_current:
-                                        matched_affiliations.append(affiliation_author_current)
-                                        break
-
-                            match_current &= (
-                                len(matched_affiliations) == len(match_pattern_current['affiliations']) and
-                                len(matched_affiliations) == len(author_current['affiliations'])
-                            )
+# Compiled affiliations sections, shared across papers and conferences in one process
+compiled_affiliations_cache = {}
+
+
+def compile_affiliations(affiliations):
+    # Reuse the compilation of an identical affiliations section
+    cache_key = json.dumps(affiliations, sort_keys=True)
+    if cache_key in compiled_affiliations_cache:
+        return compiled_affiliations_cache[cache_key]
+
+    compiled_affiliations = new_compiled_affiliations(affiliations)
+    index_affiliations(compiled_affiliations, affiliations)
+    compiled_affiliations_cache[cache_key] = compiled_affiliations
 
-                        # Track how many we match
-                        if match_current:
-                            # If we match the same affiliation via multiple patterns,
-                            # that only counts as one match
-                            if normalized_affiliation_current not in matches_found:
-                                matches_found.append(normalized_affiliation_current)
+    return compiled_affiliations
 
-                # If no match field exists, treat this as a shortcut
-                # It can match if there is exactly one affiliation with an exactly matching institution
+
+def new_compiled_affiliations(affiliations):
+    return {
+        'affiliations': affiliations,
+        'by_name': {},
+        'by_affiliation': {},
+        'by_institution': {},
+        'unindexed': [],
+        # Positions of affiliations that are overridden, never matched
+        'hidden': set(),
+    }
+
+
+def index_affiliations(compiled_affiliations, affiliations, position_start=0):
+    # Index every match pattern so an author only checks patterns that could match them.
+    # Patterns are stored with the position of their affiliation, to keep matches in config order.
+    by_name = compiled_affiliations['by_name']
+    by_affiliation = compiled_affiliations['by_affiliation']
+    by_institution = compiled_affiliations['by_institution']
+    unindexed = compiled_affiliations['unindexed']
+
+    # Lists may be shared with a compiled registry, so copy each before changing it
+    keys_copied = set()
+
+    def index_append(index, key, value):
+        if (id(index), key) not in keys_copied:
+            index[key] = list(index.get(key, []))
+            keys_copied.add((id(index), key))
+        index[key].append(value)
+
+    for position_current, normalized_affiliation_current in enumerate(affiliations, start=position_start):
+        # If a match field exists, index each pattern in the list
+        if 'match' in normalized_affiliation_current:
+            for match_pattern_current in normalized_affiliation_current['match']:
+                pattern_current = (position_current, match_pattern_current)
+
+                # Patterns for a specific person are indexed by their name
+                if 'name' in match_pattern_current:
+                    index_append(by_name, match_pattern_current['name'], pattern_current)
+                # Patterns for an affiliation list are indexed by each affiliation in the list,
+                # with None for a field that the pattern does not specify
+                elif match_pattern_current.get('affiliations'):
+                    for affiliation_pattern_current in match_pattern_current['affiliations']:
+                        affiliation_key = (
+                            affiliation_pattern_current.get('institution'),
+                            affiliation_pattern_current.get('dsl'),
+                        )
+                        if pattern_current not in by_affiliation.get(affiliation_key, []):
+                            index_append(by_affiliation, affiliation_key, pattern_current)
                 else:
-                    match_current = True
-                    match_current &= len(author_current['affiliations']) == 1
-                    match_current &= normalized_affiliation_current['canonical'] == author_current['affiliations'][0]['institution']
-
-                    # Track how many we match
-                    if match_current:
-                        matches_found.append(normalized_affiliation_current)
-
-            # Apply any exclusion
-            for match_current in matches_found:
-                if "reject" in match_current:
-                    for reject_pattern_current in match_current["reject"]:
-                        if "name" in reject_pattern_current:
-                            if author_current["name"] == reject_pattern_current["name"]:
-                                matches_found.remove(match_current)
+                    unindexed.append(pattern_current)
+
+        # If no match field exists, treat this as a shortcut on the institution
+        else:
+            index_append(by_institution, normalized_affiliation_current['canonical'], position_current)
+
+
+def match_affiliation_pattern(match_pattern_current, author_current):
+    # Within a particular pattern, match everything that is specified
+    match_current = True
+
+    # Match to a specific person
+    if 'name' in match_pattern_current:
+        match_current &= match_pattern_current['name'] == author_current.name
+
+    # Match to an affiliation list, requires matching all affiliations in both lists
+    if match_current and 'affiliations' in match_pattern_current:
+        matched_affiliations = []
+
+        for affiliation_author_current in author_current.affiliations:
+            for affiliation_pattern_current in match_pattern_current['affiliations']:
+                # Require a match on everything
+                affiliation_match_current = True
+
+                if 'institution' in affiliation_pattern_current:
+                    affiliation_match_current &= affiliation_pattern_current['institution'] == affiliation_author_current.institution
+                if 'dsl' in affiliation_pattern_current:
+                    affiliation_match_current &= affiliation_pattern_current['dsl'] == affiliation_author_current.dsl
+
+                # If we match this pattern, track that and stop further matching of it
+                if affiliation_match_current:
+                    matched_affiliations.append(affiliation_author_current)
+                    break
+
+        match_current &= (
+            len(matched_affiliations) == len(match_pattern_current['affiliations']) and
+            len(matched_affiliations) == len(author_current.affiliations)
+        )
+
+    return match_current
+
+
+def match_affiliations(compiled_affiliations, author_current):
+    # Gather the patterns that could match this author
+    profile_count('affiliation lookups')
+    candidate_patterns = []
+    candidate_patterns.extend(compiled_affiliations['by_name'].get(author_current.name, []))
+    if author_current.affiliations:
+        # Every author affiliation must match the pattern, so looking up the first is enough
+        affiliation_author_current = author_current.affiliations[0]
+        for affiliation_key in [
+            (affiliation_author_current.institution, affiliation_author_current.dsl),
+            (affiliation_author_current.institution, None),
+            (None, affiliation_author_current.dsl),
+            (None, None),
+        ]:
+            candidate_patterns.extend(compiled_affiliations['by_affiliation'].get(affiliation_key, []))
+    candidate_patterns.extend(compiled_affiliations['unindexed'])
+
+    # Track the position of each affiliation we match.
+    # If we match the same affiliation via multiple patterns, that only counts as one match.
+    positions_found = set()
+    for position_current, match_pattern_current in candidate_patterns:
+        if position_current not in positions_found and position_current not in compiled_affiliations['hidden']:
+            profile_count('affiliation pattern evaluations')
+            if match_affiliation_pattern(match_pattern_current, author_current):
+                positions_found.add(position_current)
+
+    # A shortcut can match if there is exactly one affiliation with an exactly matching institution
+    if len(author_current.affiliations) == 1:
+        positions_found.update(compiled_affiliations['by_institution'].get(author_current.affiliations[0].institution, []))
+        positions_found -= compiled_affiliations['hidden']
+
+    # In config order, an entry matched via patterns also only counts once when it is repeated
+    matches_found = []
+    for position_current in sorted(positions_found):
+        normalized_affiliation_current = compiled_affiliations['affiliations'][position_current]
+        if 'match' in normalized_affiliation_current and normalized_affiliation_current in matches_found:
+            continue
+        matches_found.append(normalized_affiliation_current)
+
+    # Apply any exclusion
+    matches_found = [
+        match_current
+        for match_current in matches_found
+        if not any(
+            'name' in reject_pattern_current and reject_pattern_current['name'] == author_current.name
+            for reject_pattern_current in match_current.get('reject', None) or []
+        )
+    ]
+
+    return matches_found
+
+
+def normalize_affiliations(config, items, diagnostics=None):
+    unmatched_authors = []
+
+    compiled_affiliations = compile_affiliations(config['affiliations'])
+
+    for item_current in items:
+        for author_current in item_current.authors:
+            # Normalize strings before normalizing structure
+            for affiliation_author_current in author_current.affiliations:
+                affiliation_author_current.institution = normalize_text(affiliation_author_current.institution)
+                affiliation_author_current.dsl = normalize_text(affiliation_author_current.dsl)
+
+            # Check for a canonical affiliation for this author
+            matches_found = match_affiliations(compiled_affiliations, author_current)
 
             if len(matches_found) == 1:
-                del author_current['affiliations']
-                author_current['affiliation'] = matches_found[0]['canonical']
+                author_current.affiliations = None
+                author_current.affiliation = matches_found[0]['canonical']
             elif len(matches_found) == 0:
-                print('No Affiliation Match:')
-                pprint.pprint(author_current)
+                if diagnostics is None:
+                    print('No Affiliation Match:')
+                    pprint.pprint(author_current.to_dict())
+                    print_suggestions(suggest_affiliations(compiled_affiliations, author_current))
 
                 unmatched_authors.append(author_current)
+            elif diagnostics is not None:
+                diagnostics['affiliations']['ambiguous'].append({
+                    'name': author_current.name,
+                    'affiliations': [affiliation_current.to_dict() for affiliation_current in author_current.affiliations],
+                    'matches': [match_current['canonical'] for match_current in matches_found],
+                })
             else:
                 print('Multiple Affiliation Match:')
-                pprint.pprint(author_current)
+                pprint.pprint(author_current.to_dict())
                 pprint.pprint(matches_found)
 
                 assert False
@@ -402,123 +1460,984 @@ def normalize_affiliations(config, items):
     if unmatched_authors:
         unmatched_authors = sorted(
             unmatched_authors,
-            key=lambda author_sort: author_sort["affiliations"][0]["institution"],
+            key=lambda author_sort: author_sort.affiliations[0].institution,
         )
 
-        pyperclip.copy(
+        if diagnostics is not None:
+            # Each author needs fixing only once
+            unmatched_authors = unique_authors(unmatched_authors)
+
+            diagnostics['affiliations']['unmatched'].extend([
+                {
+                    'name': author_current.name,
+                    'affiliations': [affiliation_current.to_dict() for affiliation_current in author_current.affiliations],
+                    'suggestions': suggest_affiliations(compiled_affiliations, author_current),
+                }
+                for author_current in unmatched_authors
+            ])
+            diagnostics['affiliations']['stub'] = affiliations_stub(unmatched_authors)
+        else:
+            pyperclip.copy(affiliations_stub(unmatched_authors))
+
+    if diagnostics is None:
+        assert len(unmatched_authors) == 0
+
+    return items
+
+
+def affiliations_stub(unmatched_authors):
+    # Suggested YAML for the affiliations section
+    return '\n'.join(
+        [
             '\n'.join(
                 [
-                    '\n'.join(
+                    "  - canonical: '{}'".format(author_current.affiliations[0].institution),
+                    "    match:",
+                    "    - name: '{}'".format(author_current.name),
+                    "      affiliations:",
+                    "\n".join(
                         [
-                            "  - canonical: '{}'".format(author_current["affiliations"][0]["institution"]),
-                            "    match:",
-                            "    - name: '{}'".format(author_current['name']),
-                            "      affiliations:",
                             "\n".join(
                                 [
-                                    "\n".join(
-                                        [
-                                            "      - institution: '{}'".format(affiliation_current["institution"]),
-                                            "        dsl: '{}'".format(affiliation_current["dsl"]),
-                                        ]
-                                    )
-                                    for affiliation_current in author_current["affiliations"]
+                                    "      - institution: '{}'".format(affiliation_current.institution),
+                                    "        dsl: '{}'".format(affiliation_current.dsl),
                                 ]
                             )
+                            for affiliation_current in author_current.affiliations
                         ]
                     )
-                    for author_current in unmatched_authors
                 ]
             )
-        )
+            for author_current in unmatched_authors
+        ]
+    )
 
-    assert len(unmatched_authors) == 0
 
-    return items
+def suggestion_text(text):
+    # Fold accents, case, hyphens, and other punctuation, so near spellings compare equal
+    text = unicodedata.normalize('NFKD', text)
+    text = ''.join(character for character in text if not unicodedata.combining(character))
+    text = SUGGESTION_SEPARATORS.sub(' ', text.casefold())
 
+    return text.strip()
+
+
+def suggestion_keys(text):
+    # Block on whole tokens and on trigrams within longer tokens, skipping initials
+    keys = set()
+    for token_current in text.split():
+        if len(token_current) > 1:
+            keys.add(token_current)
+        for position_current in range(len(token_current) - 2):
+            keys.add('#' + token_current[position_current:position_current + 3])
+
+    return keys
 
-def normalize_text(text):
-    while '  ' in text:
-        text = text.replace('  ', ' ')
 
-    text = text.replace('–', '-')
+def compile_suggestions(candidates):
+    """Build a blocking index over (text, value) candidates."""
+    entries = []
+    index = {}
+    for text_current, value_current in candidates:
+        text_current = suggestion_text(text_current)
+        if not text_current:
+            continue
 
-    text = text.replace('\u2019', '\'')
-    text = text.replace('\u201C', '"')
-    text = text.replace('\u201D', '"')
+        for key_current in suggestion_keys(text_current):
+            index.setdefault(key_current, []).append(len(entries))
+        entries.append((text_current, value_current))
+
+    # Keys shared by many candidates (e.g., "university") do not narrow the search
+    limit = max(SUGGESTION_KEY_LIMIT, len(entries) // 200)
+    index = {
+        key_current: positions
+        for key_current, positions in index.items()
+        if len(positions) <= limit
+    }
+
+    return {
+        'entries': entries,
+        'index': index,
+    }
+
+
+def suggest(compiled_suggestions, texts, count=3):
+    """Return the values closest to any of the texts, best first."""
+    scores = {}
+    for text_current in texts:
+        text_current = suggestion_text(text_current)
+
+        # Candidates sharing the most keys, without comparing against every entry
+        hits = collections.Counter()
+        for key_current in suggestion_keys(text_current):
+            hits.update(compiled_suggestions['index'].get(key_current, []))
+
+        # Break ties by position, so the same candidates are compared on every run
+        for position_current, hit_count in sorted(hits.items(), key=lambda hit: (-hit[1], hit[0]))[:SUGGESTION_CANDIDATES]:
+            entry_text, entry_value = compiled_suggestions['entries'][position_current]
+
+            # The quick upper bounds skip most candidates before the full comparison
+            matcher = difflib.SequenceMatcher(None, text_current, entry_text)
+            if matcher.real_quick_ratio() < SUGGESTION_THRESHOLD or matcher.quick_ratio() < SUGGESTION_THRESHOLD:
+                continue
+
+            score = matcher.ratio()
+            if score >= SUGGESTION_THRESHOLD and score > scores.get(entry_value, 0):
+                scores[entry_value] = score
+
+    return [
+        value_current
+        for value_current, score in sorted(scores.items(), key=lambda item: (-item[1], item[0]))[:count]
+    ]
+
+
+def suggest_names(compiled_names, author_current):
+    # Compiled on the first miss, then kept with the compiled names
+    if 'suggestions' not in compiled_names:
+        compiled_names['suggestions'] = compile_suggestions([
+            (name_current, standard_name_current['name'])
+            for name_current, standard_name_current in compiled_names['index'].items()
+        ])
+
+    return suggest(compiled_names['suggestions'], [author_current.name])
+
+
+def suggest_affiliations(compiled_affiliations, author_current):
+    # Compiled on the first miss, then kept with the compiled affiliations
+    if 'suggestions' not in compiled_affiliations:
+        candidates = []
+        for position_current, normalized_affiliation_current in enumerate(compiled_affiliations['affiliations']):
+            if position_current in compiled_affiliations['hidden']:
+                continue
+
+            canonical = normalized_affiliation_current['canonical']
+            candidates.append((canonical, canonical))
+            for match_pattern_current in normalized_affiliation_current.get('match', None) or []:
+                if match_pattern_current.get('affiliations'):
+                    candidates.append((affiliations_text(match_pattern_current['affiliations']), canonical))
+        compiled_affiliations['suggestions'] = compile_suggestions(candidates)
+
+    return suggest(compiled_affiliations['suggestions'], [affiliations_text([affiliation_current.to_dict() for affiliation_current in author_current.affiliations])])
+
+
+def affiliations_text(affiliations):
+    # All affiliations together, so authors with several affiliations compare to patterns with several
+    return ' '.join(
+        '{} {}'.format(affiliation_current.get('institution', ''), affiliation_current.get('dsl', ''))
+        for affiliation_current in affiliations
+    )
+
+
+def print_suggestions(suggestions):
+    if suggestions:
+        print('Suggestions: {}'.format(', '.join("'{}'".format(suggestion_current) for suggestion_current in suggestions)))
+
+
+def unique_authors(authors, key=None):
+    # Remove repeats of the same author, keeping the first, by default comparing names and affiliations
+    keys_found = set()
+    authors_unique = []
+    for author_current in authors:
+        if key is None:
+            key_current = json.dumps(author_current.to_dict(), sort_keys=True)
+        else:
+            key_current = key(author_current)
+        if key_current not in keys_found:
+            keys_found.add(key_current)
+            authors_unique.append(author_current)
+
+    return authors_unique
+
+
+def new_diagnostics():
+    return {
+        'names': {
+            'unmatched': [],
+            'ambiguous': [],
+            'stub': '',
+        },
+        'affiliations': {
+            'unmatched': [],
+            'ambiguous': [],
+            'stub': '',
+        },
+    }
+
+
+def has_problems(diagnostics):
+    return any(
+        diagnostics[section_current]['unmatched'] or diagnostics[section_current]['ambiguous']
+        for section_current in ['names', 'affiliations']
+    )
+
+
+class DiagnosticsDumper(yaml.SafeDumper):
+    pass
+
+
+# Output multi-line strings (e.g., suggested YAML) as blocks, so they can be copied directly
+DiagnosticsDumper.add_representer(
+    str,
+    lambda dumper, data: dumper.represent_scalar('tag:yaml.org,2002:str', data, style='|' if '\n' in data else None)
+)
+
+
+def output_diagnostics(diagnostics, file_diagnostics):
+    if file_diagnostics == '-':
+        yaml.dump(diagnostics, stream=sys.stdout, Dumper=DiagnosticsDumper, allow_unicode=True, default_flow_style=False, sort_keys=False)
+    else:
+        with open(file_diagnostics, 'w', encoding='utf-8') as f:
+            yaml.dump(diagnostics, stream=f, Dumper=DiagnosticsDumper, allow_unicode=True, default_flow_style=False, sort_keys=False)
+
+
+# Characters replaced in all text
+TEXT_TRANSLATION = str.maketrans({
+    '–': '-',
+    '\u2019': '\'',
+    '\u201C': '"',
+    '\u201D': '"',
+})
+
+TEXT_SPACES = re.compile(' {2,}')
+
+# Suggestions for unmatched names and affiliations
+SUGGESTION_SEPARATORS = re.compile(r'[\W_]+')
+SUGGESTION_KEY_LIMIT = 50
+SUGGESTION_CANDIDATES = 20
+SUGGESTION_THRESHOLD = 0.6
+
+# Fixes applied after title casing, unless a config provides its own title_fixups
+TITLE_FIXUPS = (
+    ('in Situ', 'In Situ'),
+    ('Human-Ai', 'Human-AI'),
+)
+
+
+# Names, institutions, and dsls repeat across papers, so remember recent results
+@functools.lru_cache(maxsize=65536)
+def normalize_text(text):
+    text = text.translate(TEXT_TRANSLATION)
+    text = TEXT_SPACES.sub(' ', text)
 
     text = text.strip()
 
     return text
 
 
-def normalize_title(title):
+def compile_title_fixups(config):
+    if 'title_fixups' not in config:
+        return TITLE_FIXUPS
+
+    return tuple(
+        (title_fixup_current['match'], title_fixup_current['replace'])
+        for title_fixup_current in config['title_fixups']
+    )
+
+
+@functools.lru_cache(maxsize=64)
+def title_fixups_pattern(title_fixups):
+    # One pattern for all fixups, so each title is scanned once
+    return re.compile('|'.join(re.escape(match_current) for match_current, replace_current in title_fixups))
+
+
+@functools.lru_cache(maxsize=16384)
+def normalize_title(title, title_fixups=TITLE_FIXUPS):
     title = normalize_text(title)
 
     title = titlecase.titlecase(title)
 
-    title = title.replace('in Situ', 'In Situ')
-    title = title.replace('Human-Ai', 'Human-AI')
+    if title_fixups:
+        replacements = dict(title_fixups)
+        title = title_fixups_pattern(title_fixups).sub(lambda match: replacements[match.group(0)], title)
 
     return title
 
 
+def normalize_titles(config, items):
+    title_fixups = compile_title_fixups(config)
+    for content_current in items:
+        content_current.title = normalize_title(content_current.title, title_fixups)
+
+    return items
+
+
 def normalize_title_sort(title):
     return (''.join(c for c in title if c in string.ascii_letters + string.digits)).casefold()
 
 
+def sort_key(item):
+    # Best papers first, then honorable mentions, each by title
+    return (not item.bestpaper, not item.honorablemention, normalize_title_sort(item.title))
+
+
 def sort_items(config, items):
     # Sort them
-    for item_current in items:
-        item_current['title_sort'] = normalize_title_sort(item_current['title'])
-    items.sort(
-        key=operator.itemgetter('title_sort')
-    )
-    for item_current in items:
-        del item_current['title_sort']
-
-    items.sort(
-        key=operator.itemgetter('honorablemention'),
-        reverse=True
-    )
     items.sort(
-        key=operator.itemgetter('bestpaper'),
-        reverse=True
+        key=sort_key
     )
 
     return items
 
 
-def output_yaml(config, items):
-    data = {
-        'papers': items
-    }
-    with open(config['file_output'], 'w', encoding='utf-8') as f:
-        yaml.safe_dump(
-            data,
+def serialize_yaml(papers):
+    f = io.StringIO()
+    if not papers:
+        yaml.dump(
+            {
+                'papers': papers
+            },
             stream=f,
+            Dumper=YamlSafeDumper,
             allow_unicode=True,
             default_flow_style=False
         )
+    else:
+        # Dump one paper at a time.
+        #
+        # A top-level list is not indented, so this is the same as dumping {'papers': papers}.
+        f.write('papers:\n')
+        for paper_current in papers:
+            yaml.dump(
+                [paper_current],
+                stream=f,
+                Dumper=YamlSafeDumper,
+                allow_unicode=True,
+                default_flow_style=False
+            )
+
+    # Keep the line endings of a file written in text mode
+    return f.getvalue().replace('\n', os.linesep).encode('utf-8')
+
+
+def serialize_json(papers):
+    return json.dumps({'papers': papers}, ensure_ascii=False, separators=(',', ':')).encode('utf-8')
+
+
+def serialize_msgpack(papers):
+    return msgpack.packb({'papers': papers}, use_bin_type=True)
+
+
+# Serializers for each output in a config, file_output is always written
+OUTPUT_FORMATS = {
+    'file_output': serialize_yaml,
+    'file_output_json': serialize_json,
+    'file_output_msgpack': serialize_msgpack,
+}
+
+
+def write_if_changed(file_output, data):
+    # Leave an unchanged file alone, so its mtime is too and nothing rebuilds from it
+    try:
+        if os.path.getsize(file_output) == len(data):
+            output_hash = hashlib.sha256()
+            with open(file_output, 'rb') as f:
+                for chunk in iter(lambda: f.read(1 << 20), b''):
+                    output_hash.update(chunk)
+            if output_hash.digest() == hashlib.sha256(data).digest():
+                profile_count('outputs unchanged')
+                return False
+    except OSError:
+        pass
+
+    # Readers never see a partial output
+    write_atomic(file_output, lambda f: f.write(data))
+    profile_count('outputs written')
+
+    return True
+
+
+def output_papers(config, items):
+    # Serialize papers once, shared by every format
+    papers = [item_current.to_dict() for item_current in items]
+
+    files_written = []
+    for key_output, serialize in OUTPUT_FORMATS.items():
+        if key_output in config and write_if_changed(config[key_output], serialize(papers)):
+            files_written.append(config[key_output])
+
+    return files_written
+
+
+# Tables and indexes of the SQLite output, each conference replaced as a whole when written again
+SQLITE_SCHEMA = """
+CREATE TABLE IF NOT EXISTS conferences (
+    conference TEXT PRIMARY KEY,
+    year INTEGER
+);
+CREATE TABLE IF NOT EXISTS papers (
+    conference TEXT NOT NULL,
+    paper_id TEXT NOT NULL,
+    year INTEGER,
+    position INTEGER NOT NULL,
+    title TEXT NOT NULL,
+    paper TEXT NOT NULL,
+    PRIMARY KEY (conference, paper_id)
+);
+CREATE TABLE IF NOT EXISTS affiliations (
+    canonical TEXT PRIMARY KEY
+);
+CREATE TABLE IF NOT EXISTS authors (
+    conference TEXT NOT NULL,
+    paper_id TEXT NOT NULL,
+    position INTEGER NOT NULL,
+    name TEXT NOT NULL,
+    affiliation TEXT,
+    PRIMARY KEY (conference, paper_id, position)
+);
+CREATE TABLE IF NOT EXISTS awards (
+    conference TEXT NOT NULL,
+    paper_id TEXT NOT NULL,
+    award TEXT NOT NULL,
+    PRIMARY KEY (conference, paper_id, award)
+);
+CREATE INDEX IF NOT EXISTS papers_year ON papers (year);
+CREATE INDEX IF NOT EXISTS authors_name ON authors (name);
+CREATE INDEX IF NOT EXISTS authors_affiliation ON authors (affiliation);
+CREATE INDEX IF NOT EXISTS awards_award ON awards (award);
+"""
+
+
+def sqlite_conference(config):
+    # Default to the name of the output, e.g., 'chi2025' for 'chi2025papers.yml', and the year in that name
+    conference = config.get('conference', None)
+    if conference is None:
+        conference = re.sub(r'papers$', '', os.path.splitext(os.path.basename(config['file_output']))[0])
+
+    year = config.get('year', None)
+    if year is None:
+        year_found = re.search(r'(?:19|20)\d\d', conference)
+        if year_found:
+            year = int(year_found.group(0))
+
+    return conference, year
+
+
+def upsert_sqlite(connection, config, items):
+    conference, year = sqlite_conference(config)
+
+    # Replace everything previously written for this conference
+    for table_current in ['awards', 'authors', 'papers']:
+        connection.execute('DELETE FROM {} WHERE conference = ?'.format(table_current), (conference,))
+    connection.execute(
+        'INSERT INTO conferences (conference, year) VALUES (?, ?) ON CONFLICT (conference) DO UPDATE SET year = excluded.year',
+        (conference, year)
+    )
+
+    connection.executemany(
+        'INSERT INTO papers (conference, paper_id, year, position, title, paper) VALUES (?, ?, ?, ?, ?, ?)',
+        (
+            (conference, str(item_current.id), year, position_current, item_current.title, json.dumps(item_current.to_dict(), ensure_ascii=False, sort_keys=True))
+            for position_current, item_current in enumerate(items)
+        )
+    )
+    connection.executemany(
+        'INSERT OR IGNORE INTO affiliations (canonical) VALUES (?)',
+        (
+            (affiliation_current,)
+            for affiliation_current in sorted(set(
+                author_current.affiliation
+                for item_current in items
+                for author_current in item_current.authors
+                if author_current.affiliation is not None
+            ))
+        )
+    )
+    connection.executemany(
+        'INSERT INTO authors (conference, paper_id, position, name, affiliation) VALUES (?, ?, ?, ?, ?)',
+        (
+            (conference, str(item_current.id), position_current, author_current.name, author_current.affiliation)
+            for item_current in items
+            for position_current, author_current in enumerate(item_current.authors)
+        )
+    )
+    connection.executemany(
+        'INSERT INTO awards (conference, paper_id, award) VALUES (?, ?, ?)',
+        (
+            (conference, str(item_current.id), award_current)
+            for item_current in items
+            for award_current in ['bestpaper', 'honorablemention']
+            if getattr(item_current, award_current)
+        )
+    )
+
+
+def output_sqlite(file_sqlite, results):
+    # Write every conference in a single transaction
+    connection = sqlite3.connect(file_sqlite)
+    try:
+        connection.executescript(SQLITE_SCHEMA)
+        with connection:
+            for config, items in results:
+                upsert_sqlite(connection, config, items)
+
+            # Keep only affiliations some author still has
+            connection.execute('DELETE FROM affiliations WHERE canonical NOT IN (SELECT affiliation FROM authors WHERE affiliation IS NOT NULL)')
+    finally:
+        connection.close()
+
+
+# Loaders for each file_input_type
+INPUT_TYPES = {
+    'sigchi program': load_sigchi_program,
+    'proceedings': load_proceedings_xml,
+}
+
+
+def run_config(file_config, stream=False, cache=False, incremental=False, diagnostics=None):
+    with profile_stage('load config'):
+        config = load_config(file_config)
+
+    items = parse_program(config, stream=stream, cache=cache, incremental=incremental, diagnostics=diagnostics)
+
+    # Do not output papers with unresolved authors
+    if diagnostics is None or not has_problems(diagnostics):
+        with profile_stage('output') as stage:
+            output_papers(config, items)
+            stage['items'] = len(items)
+
+    return config, items
+
+
+def count_authors(items):
+    return sum(len(item_current.authors) for item_current in items)
+
+
+def count_items(items):
+    return {
+        'papers': len(items),
+        'bestpaper': len([item for item in items if item.bestpaper]),
+        'honorablemention': len([item for item in items if item.honorablemention]),
+    }
+
+
+def run_batch_config(file_config, options, keep_items=False):
+    # Run in isolation, keeping any output and error with this config
+    result = {
+        'config': file_config,
+        'error': None,
+    }
+
+    output = io.StringIO()
+    try:
+        with contextlib.redirect_stdout(output):
+            config, items = run_config(file_config, **options)
+        result.update(count_items(items))
+        if keep_items:
+            result['items'] = (config, items)
+    except Exception:
+        result['error'] = traceback.format_exc()
+    result['output'] = output.getvalue()
+
+    return result
+
+
+def run_batch(files_config, options, jobs=None, file_sqlite=None):
+    # Default to every config in our data
+    if not files_config:
+        files_config = sorted(glob.glob(os.path.join('data', '**', 'config.yml'), recursive=True))
+
+    with concurrent.futures.ProcessPoolExecutor(max_workers=jobs) as executor:
+        results = list(executor.map(
+            run_batch_config,
+            files_config,
+            [options] * len(files_config),
+            [file_sqlite is not None] * len(files_config),
+        ))
+
+    # Conferences that failed keep what was previously written for them
+    if file_sqlite is not None:
+        output_sqlite(file_sqlite, [result.pop('items') for result in results if not result['error']])
+
+    # Report each failure on its own
+    for result in results:
+        if result['error']:
+            print('Failed: {}'.format(result['config']))
+            print(result['output'], end='')
+            print(result['error'])
+
+    # Then a combined summary
+    totals = {
+        'papers': 0,
+        'bestpaper': 0,
+        'honorablemention': 0,
+    }
+    for result in results:
+        if result['error']:
+            print('{}: failed'.format(result['config']))
+        else:
+            print('{}: {} papers, {} best paper award, {} best paper honorable mention'.format(
+                result['config'],
+                result['papers'],
+                result['bestpaper'],
+                result['honorablemention'],
+            ))
+            for key_current in totals:
+                totals[key_current] += result[key_current]
+
+    print('{} configs, {} failed'.format(len(results), len([result for result in results if result['error']])))
+    print('{} papers'.format(totals['papers']))
+    print('{} best paper award'.format(totals['bestpaper']))
+    print('{} best paper honorable mention'.format(totals['honorablemention']))
+
+    return results
+
+
+def whole_program_config(config):
+    # An include without criteria matches every paper, and nothing is excluded
+    config = dict(config)
+    config['include'] = [{}]
+    config['exclude'] = []
+
+    # Keep the reduced program apart from that of our criteria
+    config['file_cache'] = config['file_input'] + '.whole.cache.pickle'
+
+    # Only the output given for the whole program is written
+    for key_output in OUTPUT_FORMATS:
+        config.pop(key_output, None)
+
+    return config
+
+
+# The config of the whole program this worker process is normalizing shards of
+shard_config = None
+
+
+def start_shard_worker(config):
+    global shard_config
+    shard_config = config
+
+    # Compile rules once per worker, before its first shard
+    compile_names(config['names'])
+    compile_affiliations(config['affiliations'])
+
+
+def normalize_shard(items):
+    # Papers outside our criteria will have unmatched authors, so always collect them rather than stop
+    diagnostics = new_diagnostics()
+    items = normalize_names(shard_config, items, diagnostics=diagnostics)
+    items = normalize_affiliations(shard_config, items, diagnostics=diagnostics)
+    items = normalize_titles(shard_config, items)
+    items = sort_items(shard_config, items)
+
+    return items, diagnostics
+
+
+def merge_shards(shards):
+    # Shards are contiguous and each is sorted, so a stable merge gives the same order as sorting all papers
+    return list(heapq.merge(*shards, key=sort_key))
+
+
+def merge_diagnostics(diagnostics, shards_diagnostics):
+    # Ambiguous names are found when compiling, so every shard finds the same
+    if shards_diagnostics:
+        diagnostics['names']['ambiguous'].extend(shards_diagnostics[0]['names']['ambiguous'])
+
+    for shard_diagnostics in shards_diagnostics:
+        diagnostics['affiliations']['ambiguous'].extend(shard_diagnostics['affiliations']['ambiguous'])
+
+    # Each author needs fixing only once, though they may appear in several shards
+    for section_current, key_sort in [
+        ('names', lambda unmatched_sort: unmatched_sort['name']),
+        ('affiliations', lambda unmatched_sort: unmatched_sort['affiliations'][0]['institution']),
+    ]:
+        keys_found = set()
+        for unmatched_current in sorted(
+            [
+                unmatched_current
+                for shard_diagnostics in shards_diagnostics
+                for unmatched_current in shard_diagnostics[section_current]['unmatched']
+            ],
+            key=key_sort,
+        ):
+            key_current = json.dumps(unmatched_current, sort_keys=True)
+            if key_current not in keys_found:
+                keys_found.add(key_current)
+                diagnostics[section_current]['unmatched'].append(unmatched_current)
+
+    # Stubs are built from authors
+    diagnostics['names']['stub'] = names_stub([
+        Author(unmatched_current['name'], [])
+        for unmatched_current in diagnostics['names']['unmatched']
+    ])
+    diagnostics['affiliations']['stub'] = affiliations_stub([
+        Author(
+            unmatched_current['name'],
+            [
+                Affiliation(affiliation_current['institution'], affiliation_current['dsl'])
+                for affiliation_current in unmatched_current['affiliations']
+            ]
+        )
+        for unmatched_current in diagnostics['affiliations']['unmatched']
+    ])
+
+    return diagnostics
+
+
+def run_whole_program(file_config, file_output, diagnostics, stream=False, cache=False, jobs=None):
+    # Normalize every paper in the program, not only those matching our criteria
+    with profile_stage('load config'):
+        config = whole_program_config(load_config(file_config))
+        config['file_output'] = file_output
+
+    cache_key = program_cache_key(config) if cache else None
+    items = load_program(config, stream=stream, cache_key=cache_key)
+
+    # One contiguous shard per process
+    jobs = jobs or os.cpu_count() or 1
+    shard_size = max(1, -(-len(items) // jobs))
+    shards = [items[position_current:position_current + shard_size] for position_current in range(0, len(items), shard_size)]
+    del items
+
+    with profile_stage('normalize shards') as stage:
+        with concurrent.futures.ProcessPoolExecutor(max_workers=max(1, len(shards)), initializer=start_shard_worker, initargs=(config,)) as executor:
+            results = list(executor.map(normalize_shard, shards))
+        stage['items'] = sum(count_authors(shard_items) for shard_items, shard_diagnostics in results)
+
+    with profile_stage('merge') as stage:
+        items = merge_shards([shard_items for shard_items, shard_diagnostics in results])
+        merge_diagnostics(diagnostics, [shard_diagnostics for shard_items, shard_diagnostics in results])
+        stage['items'] = len(items)
+
+    # Unmatched authors are written with their program affiliations, so they can be audited
+    with profile_stage('output') as stage:
+        output_papers(config, items)
+        stage['items'] = len(items)
+
+    return config, items
+
+
+# Seconds between checks for changes in watch mode
+WATCH_INTERVAL = 0.5
+
+
+def watch_files(file_config, config):
+    # The config, and any registry or program it reads
+    return [file_config] + [config[key_current] for key_current in ['registry', 'file_input'] if key_current in config]
+
+
+def watch_stats(files_watched):
+    stats = {}
+    for file_current in files_watched:
+        try:
+            stat_current = os.stat(file_current)
+            stats[file_current] = (stat_current.st_mtime_ns, stat_current.st_size)
+        except OSError:
+            stats[file_current] = None
+
+    return stats
+
+
+def watch_program_key(config):
+    # The reduced program only changes with the input and our criteria
+    return json.dumps([
+        config['file_input'],
+        config['file_input_type'],
+        config['include'],
+        config['exclude'],
+        watch_stats([config['file_input']]),
+    ], sort_keys=True)
+
+
+def retain_compiled(config):
+    # Drop compilations of sections from earlier edits, keeping those of the current config
+    for compiled_cache, section in [
+        (compiled_names_cache, config['names']),
+        (compiled_affiliations_cache, config['affiliations']),
+    ]:
+        cache_key = json.dumps(section, sort_keys=True)
+        compiled_current = compiled_cache.get(cache_key)
+        compiled_cache.clear()
+        if compiled_current is not None:
+            compiled_cache[cache_key] = compiled_current
+
+    # Likewise for registries, keeping the one the current config inherits from
+    registries_current = {
+        registry_key: registry
+        for registry_key, registry in loaded_registries.items()
+        if registry_key == config.get('registry_key', None)
+    }
+    loaded_registries.clear()
+    loaded_registries.update(registries_current)
+
+
+def unmatched_keys(diagnostics):
+    return {
+        'names': [
+            unmatched_current['name']
+            for unmatched_current in diagnostics['names']['unmatched']
+        ] + [
+            ambiguous_current['name']
+            for ambiguous_current in diagnostics['names']['ambiguous']
+        ],
+        'affiliations': [
+            '{} ({})'.format(unmatched_current['name'], affiliations_text(unmatched_current['affiliations']).strip())
+            for unmatched_current in diagnostics['affiliations']['unmatched'] + diagnostics['affiliations']['ambiguous']
+        ],
+    }
+
+
+def print_unmatched_diff(unmatched_previous, unmatched_current):
+    for section_current in ['names', 'affiliations']:
+        if unmatched_previous is not None:
+            keys_previous = set(unmatched_previous[section_current])
+            keys_current = set(unmatched_current[section_current])
+            for key_current in sorted(keys_previous - keys_current):
+                print('  - resolved {}: {}'.format(section_current, key_current))
+            for key_current in sorted(keys_current - keys_previous):
+                print('  + unmatched {}: {}'.format(section_current, key_current))
+
+        print('{} unmatched {}'.format(len(unmatched_current[section_current]), section_current))
+
+
+def run_watch(file_config, stream=False, cache=False, file_diagnostics=None):
+    # Keep the reduced program in memory, re-running normalization and output on every change to the config
+    program = None
+    program_key = None
+    unmatched_previous = None
+
+    files_watched = [file_config]
+    stats_previous = None
+    while True:
+        stats_current = watch_stats(files_watched)
+        if stats_current == stats_previous:
+            time.sleep(WATCH_INTERVAL)
+            continue
+
+        time_start = time.perf_counter()
+        try:
+            config = read_config(file_config)
+
+            # Stat any newly named registry or input before reading it, so an edit during the read is seen next time
+            files_watched = watch_files(file_config, config)
+            stats_new = watch_stats([file_current for file_current in files_watched if file_current not in stats_current])
+            stats_current = {
+                file_current: stats_current[file_current] if file_current in stats_current else stats_new[file_current]
+                for file_current in files_watched
+            }
+
+            config = prepare_config(config)
+
+            program_key_current = watch_program_key(config)
+            if program_key_current != program_key:
+                cache_key = program_cache_key(config) if cache else None
+                program = pickle.dumps(load_program(config, stream=stream, cache_key=cache_key), protocol=pickle.HIGHEST_PROTOCOL)
+                program_key = program_key_current
+
+            # Normalization updates papers in place, so start each run from a copy
+            items = pickle.loads(program)
+
+            diagnostics = new_diagnostics()
+            items = normalize_program(config, items, diagnostics=diagnostics)
+            retain_compiled(config)
+
+            # Do not output papers with unresolved authors
+            if not has_problems(diagnostics):
+                files_written = output_papers(config, items)
+
+            if file_diagnostics is not None:
+                output_diagnostics(diagnostics, file_diagnostics)
+
+            counts = count_items(items)
+            print('{} papers, {} best paper award, {} best paper honorable mention in {:.3f} s{}'.format(
+                counts['papers'],
+                counts['bestpaper'],
+                counts['honorablemention'],
+                time.perf_counter() - time_start,
+                '' if has_problems(diagnostics) else ', {} outputs written'.format(len(files_written)),
+            ))
+
+            unmatched_current = unmatched_keys(diagnostics)
+            print_unmatched_diff(unmatched_previous, unmatched_current)
+            unmatched_previous = unmatched_current
+        except Exception:
+            # Keep watching, the next edit may fix it
+            traceback.print_exc()
+
+        stats_previous = stats_current
+        sys.stdout.flush()
 
 
 def main():
     parser = argparse.ArgumentParser(description='Conference data parser for DUB')
-    parser.add_argument('-f', required=True, dest='file_config')
+    parser.add_argument('-f', dest='file_config')
+    parser.add_argument('--batch', nargs='*', metavar='CONFIG', help='run many configs in parallel, defaults to every config in data')
+    parser.add_argument('--jobs', type=int, help='number of processes for --batch or --whole-program, defaults to the number of cores')
+    parser.add_argument('--stream', action='store_true', help='parse the program incrementally to reduce memory')
+    parser.add_argument('--cache', action='store_true', help='reuse the parsed program from a previous run on the same input')
+    parser.add_argument('--incremental', action='store_true', help='only redo matching affected by config changes since the previous run')
+    parser.add_argument('--profile', metavar='FILE', help='write per-stage timings and counters as json')
+    parser.add_argument('--diagnostics', nargs='?', const='-', metavar='FILE', help='collect every unmatched or ambiguous name and affiliation into a report instead of stopping at the first stage with problems')
+    parser.add_argument('--watch', action='store_true', help='keep the program in memory and re-run whenever the config changes')
+    parser.add_argument('--whole-program', metavar='FILE', help='normalize every paper in the program across --jobs processes, ignoring include and exclude, and write them to FILE')
+    parser.add_argument('--sqlite', metavar='FILE', help='also write papers, authors, affiliations, and awards into a database, replacing those of the same conference')
     args = parser.parse_args()
 
-    with open(args.file_config, 'r', encoding='utf-8') as f:
-        config = yaml.safe_load(f)
-        parse_config(config)
-
-    if config['file_input_type'] == 'sigchi program':
-        items = parse_sigchi_program(config)
-
-    output_yaml(config, items)
+    options = {
+        'stream': args.stream,
+        'cache': args.cache,
+        'incremental': args.incremental,
+    }
 
-    print('{} papers'.format(len(items)))
-    print('{} best paper award'.format(len([item for item in items if item['bestpaper']])))
-    print('{} best paper honorable mention'.format(len([item for item in items if item['honorablemention']])))
+    if args.batch is not None:
+        results = run_batch(args.batch, options, jobs=args.jobs, file_sqlite=args.sqlite)
+        if any(result['error'] for result in results):
+            sys.exit(1)
+        return
+
+    if args.file_config is None:
+        parser.error('one of -f or --batch is required')
+
+    if args.watch:
+        try:
+            run_watch(args.file_config, stream=args.stream, cache=args.cache, file_diagnostics=args.diagnostics)
+        except KeyboardInterrupt:
+            pass
+        return
+
+    if args.diagnostics is not None:
+        diagnostics = new_diagnostics()
+    else:
+        diagnostics = None
+
+    if args.profile:
+        start_profile()
+
+    if args.whole_program is not None:
+        # Papers outside our criteria will have unmatched authors, so always collect them
+        diagnostics_whole = diagnostics if diagnostics is not None else new_diagnostics()
+        config, items = run_whole_program(
+            args.file_config,
+            args.whole_program,
+            diagnostics_whole,
+            stream=args.stream,
+            cache=args.cache,
+            jobs=args.jobs,
+        )
+        if diagnostics is None:
+            print('{} unmatched names'.format(len(diagnostics_whole['names']['unmatched'])))
+            print('{} unmatched affiliations'.format(len(diagnostics_whole['affiliations']['unmatched'])))
+    else:
+        config, items = run_config(args.file_config, diagnostics=diagnostics, **options)
+
+    if args.whole_program is None and args.sqlite and (diagnostics is None or not has_problems(diagnostics)):
+        with profile_stage('output sqlite') as stage:
+            output_sqlite(args.sqlite, [(config, items)])
+            stage['items'] = len(items)
+
+    counts = count_items(items)
+    print('{} papers'.format(counts['papers']))
+    print('{} best paper award'.format(counts['bestpaper']))
+    print('{} best paper honorable mention'.format(counts['honorablemention']))
+
+    if args.profile:
+        profile_report['counts'] = counts
+        with open(args.profile, 'w', encoding='utf-8') as f:
+            json.dump(profile_report, f, indent=2)
+
+    if diagnostics is not None:
+        output_diagnostics(diagnostics, args.diagnostics)
+        if has_problems(diagnostics):
+            sys.exit(1)
 
 
 if __name__ == '__main__':
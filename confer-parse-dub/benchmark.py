@@ -0,0 +1,308 @@
+import argparse
+import contextlib
+import importlib.util
+import io
+import json
+import os
+import random
+import string
+import tempfile
+import time
+import tracemalloc
+import yaml
+
+
+# The pipeline lives in __main__.py, load it as a regular module
+spec = importlib.util.spec_from_file_location('confer_parse_dub', os.path.join(os.path.dirname(os.path.abspath(__file__)), '__main__.py'))
+pipeline = importlib.util.module_from_spec(spec)
+spec.loader.exec_module(pipeline)
+
+
+INCLUDE_KEYWORD = 'Synthetica'
+INCLUDE_TRACK_ID = 1
+OTHER_TRACK_ID = 2
+
+
+def synthetic_word(random_current, length):
+    return random_current.choice(string.ascii_uppercase) + ''.join(random_current.choice(string.ascii_lowercase) for i in range(length - 1))
+
+
+def generate_synthetic(
+    contents=5000,
+    people=20000,
+    authors_per_paper=5,
+    name_aliases=1,
+    affiliations=250,
+    affiliation_patterns=4,
+    include_fraction=0.05,
+    seed=0,
+):
+    """Generate a SIGCHI program and a config whose names and affiliations match every author."""
+    random_current = random.Random(seed)
+
+    # Filler text only needs to look like text, so draw it from a small pool of words
+    words = [synthetic_word(random_current, random_current.randint(2, 9)) for i in range(2000)]
+
+    # People, each with a standard name and alternatives that appear in the program
+    program_people = []
+    config_names = []
+    for person_index in range(people):
+        first_name = synthetic_word(random_current, 6)
+        last_name = '{}{}'.format(synthetic_word(random_current, 7), person_index)
+        middle_initial = random_current.choice(string.ascii_uppercase)
+
+        aliases = ['{} {}'.format(first_name, last_name)] + [
+            '{} {}{} {}'.format(first_name, middle_initial, alias_index, last_name)
+            for alias_index in range(name_aliases)
+        ]
+
+        standard_name = {'name': '{} {} {}'.format(first_name, middle_initial, last_name)}
+        if name_aliases:
+            standard_name['match'] = [{'name': alias_current} for alias_current in aliases[1:]]
+        config_names.append(standard_name)
+
+        # Half appear with their standard name, the rest with an alternative
+        person_current = {
+            'id': person_index,
+            'firstName': first_name,
+            'lastName': last_name,
+        }
+        if name_aliases and random_current.random() < 0.5:
+            person_current['middleInitial'] = '{}{}.'.format(middle_initial, random_current.randrange(name_aliases))
+        else:
+            person_current['middleInitial'] = '{}.'.format(middle_initial)
+        program_people.append(person_current)
+
+    # Affiliations, each matched by several (institution, dsl) patterns
+    config_affiliations = []
+    affiliation_choices = []
+    for affiliation_index in range(affiliations):
+        institution = '{} University {}'.format(INCLUDE_KEYWORD if affiliation_index % 2 == 0 else synthetic_word(random_current, 8), affiliation_index)
+        canonical = 'Canonical {}'.format(institution)
+
+        if affiliation_index % 10 == 9:
+            # Shortcut, matching a single affiliation by its institution
+            config_affiliations.append({'canonical': institution})
+            affiliation_choices.append([{'institution': institution, 'dsl': ''}])
+            continue
+
+        match_patterns = []
+        for pattern_index in range(affiliation_patterns):
+            affiliation_current = {
+                'institution': institution,
+                'dsl': 'Department of {} {}'.format(synthetic_word(random_current, 9), pattern_index),
+            }
+            match_patterns.append({'affiliations': [affiliation_current]})
+            affiliation_choices.append([affiliation_current])
+        config_affiliations.append({'canonical': canonical, 'match': match_patterns})
+
+    # Content, with a fraction on the included track with an included institution
+    program_contents = []
+    for content_index in range(contents):
+        content_authors = []
+        included = random_current.random() < include_fraction
+        for author_index in range(authors_per_paper):
+            author_affiliations = random_current.choice(affiliation_choices)
+            if included and author_index == 0:
+                while INCLUDE_KEYWORD not in author_affiliations[0]['institution']:
+                    author_affiliations = random_current.choice(affiliation_choices)
+            content_authors.append({
+                'personId': random_current.randrange(people),
+                'affiliations': [dict(affiliation_current) for affiliation_current in author_affiliations],
+            })
+
+        content_current = {
+            'id': 100000 + content_index,
+            'trackId': INCLUDE_TRACK_ID if included else OTHER_TRACK_ID,
+            'typeId': 1,
+            'title': ' '.join(random_current.choices(words, k=random_current.randint(4, 12))).lower(),
+            'abstract': ' '.join(random_current.choices(words, k=150)),
+            'keywords': random_current.choices(words, k=5),
+            'doi': 'https://doi.org/10.1145/{}'.format(content_index),
+            'authors': content_authors,
+        }
+        award = random_current.random()
+        if award < 0.01:
+            content_current['award'] = 'BEST_PAPER'
+        elif award < 0.05:
+            content_current['award'] = 'HONORABLE_MENTION'
+        program_contents.append(content_current)
+
+    program = {
+        'conference': {'name': 'Synthetic'},
+        'sessions': [{'id': session_index, 'name': random_current.choice(words)} for session_index in range(contents // 5)],
+        'contents': program_contents,
+        'people': program_people,
+    }
+
+    config = {
+        'file_input_type': 'sigchi program',
+        'include': [
+            {
+                'affiliation': INCLUDE_KEYWORD,
+                'trackId': INCLUDE_TRACK_ID,
+            },
+        ],
+        'exclude': [],
+        'names': config_names,
+        'affiliations': config_affiliations,
+    }
+
+    return program, config
+
+
+def measure(stage, count, function, memory):
+    """Run a stage, returning its result and measurements."""
+    if memory:
+        tracemalloc.start()
+
+    # Keep the output of stages to the measurements
+    with contextlib.redirect_stdout(io.StringIO()):
+        time_start = time.perf_counter()
+        result = function()
+        seconds = time.perf_counter() - time_start
+
+    measurement = {
+        'stage': stage,
+        'seconds': seconds,
+        'items': count(result),
+    }
+    measurement['items_per_second'] = measurement['items'] / seconds if seconds > 0 else None
+    if memory:
+        measurement['peak_bytes'] = tracemalloc.get_traced_memory()[1]
+        tracemalloc.stop()
+
+    return result, measurement
+
+
+def run_stages(config, contents, stream, memory):
+    """Run each stage of parse_program and output_papers on its own."""
+    measurements = []
+
+    # Parsing is measured over all content in the program, later stages over the kept papers
+    (items, people_index), measurement = measure(
+        'parse', lambda result: contents,
+        lambda: pipeline.reduce_sigchi_program(config, stream=stream),
+        memory
+    )
+    measurements.append(measurement)
+
+    items, measurement = measure('build papers', pipeline.count_authors, lambda: pipeline.build_papers(items, people_index), memory)
+    measurements.append(measurement)
+
+    items, measurement = measure('normalize names', pipeline.count_authors, lambda: pipeline.normalize_names(config, items), memory)
+    measurements.append(measurement)
+
+    items, measurement = measure('normalize affiliations', pipeline.count_authors, lambda: pipeline.normalize_affiliations(config, items), memory)
+    measurements.append(measurement)
+
+    items, measurement = measure('normalize titles', len, lambda: pipeline.normalize_titles(config, items), memory)
+    measurements.append(measurement)
+
+    items, measurement = measure('sort', len, lambda: pipeline.sort_items(config, items), memory)
+    measurements.append(measurement)
+
+    def output_papers():
+        pipeline.output_papers(config, items)
+        return items
+
+    items, measurement = measure('output', len, output_papers, memory)
+    measurements.append(measurement)
+
+    return measurements
+
+
+def clear_caches():
+    pipeline.compiled_names_cache.clear()
+    pipeline.compiled_affiliations_cache.clear()
+    pipeline.normalize_text.cache_clear()
+    pipeline.normalize_title.cache_clear()
+
+
+def run_benchmark(sizes, directory, stream=False, memory=True):
+    program, config = generate_synthetic(**sizes)
+
+    config['file_input'] = os.path.join(directory, 'synthetic_program.json')
+    config['file_output'] = os.path.join(directory, 'synthetic_papers.yml')
+    with open(config['file_input'], 'w', encoding='utf-8') as f:
+        json.dump(program, f)
+    with open(os.path.join(directory, 'config.yml'), 'w', encoding='utf-8') as f:
+        yaml.dump(config, stream=f, Dumper=pipeline.YamlSafeDumper, allow_unicode=True, default_flow_style=False, sort_keys=False)
+    del program
+
+    # Compiled rules and normalized text are cached per process, start each run without them
+    clear_caches()
+
+    # Time without tracing, which slows allocation, then trace memory in a second run
+    measurements = run_stages(config, sizes['contents'], stream, memory=False)
+    if memory:
+        clear_caches()
+        for measurement, measurement_memory in zip(measurements, run_stages(config, sizes['contents'], stream, memory=True)):
+            measurement['peak_bytes'] = measurement_memory['peak_bytes']
+
+    return {
+        'sizes': sizes,
+        'stream': stream,
+        'input_bytes': os.path.getsize(config['file_input']),
+        'stages': measurements,
+    }
+
+
+def print_report(report):
+    print('{} bytes of program json, {}'.format(
+        report['input_bytes'],
+        ', '.join('{} {}'.format(value, key) for key, value in report['sizes'].items())
+    ))
+    for measurement in report['stages']:
+        print('{:<24} {:>9.3f} s {:>9} items {:>12} items/s {:>12}'.format(
+            measurement['stage'],
+            measurement['seconds'],
+            measurement['items'],
+            '{:.0f}'.format(measurement['items_per_second']) if measurement['items_per_second'] else '-',
+            '{:.1f} MiB'.format(measurement['peak_bytes'] / (1 << 20)) if 'peak_bytes' in measurement else '',
+        ))
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Benchmark the conference data parser on a synthetic SIGCHI program')
+    parser.add_argument('--contents', type=int, default=5000)
+    parser.add_argument('--people', type=int, default=20000)
+    parser.add_argument('--authors-per-paper', type=int, default=5)
+    parser.add_argument('--name-aliases', type=int, default=1)
+    parser.add_argument('--affiliations', type=int, default=250)
+    parser.add_argument('--affiliation-patterns', type=int, default=4)
+    parser.add_argument('--include-fraction', type=float, default=0.05)
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--stream', action='store_true', help='parse with the streaming reader')
+    parser.add_argument('--no-memory', action='store_true', help='skip the second run that traces peak memory')
+    parser.add_argument('--directory', help='keep the generated program, config, and output here')
+    parser.add_argument('--output', help='write the report as json')
+    args = parser.parse_args()
+
+    sizes = {
+        'contents': args.contents,
+        'people': args.people,
+        'authors_per_paper': args.authors_per_paper,
+        'name_aliases': args.name_aliases,
+        'affiliations': args.affiliations,
+        'affiliation_patterns': args.affiliation_patterns,
+        'include_fraction': args.include_fraction,
+        'seed': args.seed,
+    }
+
+    if args.directory:
+        os.makedirs(args.directory, exist_ok=True)
+        report = run_benchmark(sizes, args.directory, stream=args.stream, memory=not args.no_memory)
+    else:
+        with tempfile.TemporaryDirectory() as directory:
+            report = run_benchmark(sizes, directory, stream=args.stream, memory=not args.no_memory)
+
+    print_report(report)
+
+    if args.output:
+        with open(args.output, 'w', encoding='utf-8') as f:
+            json.dump(report, f, indent=2)
+
+
+if __name__ == '__main__':
+    main()